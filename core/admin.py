@@ -1,10 +1,171 @@
 from django.contrib import admin
-from .models import User, Product, Sale, ShopkeeperPermission, Branch
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from .models import (
+    User, Product, Sale, ShopkeeperPermission, Branch, CustomerBalance, Payment, SaleArchive, SalesRollup,
+    Stocktake, StockAdjustment, StockTransfer, StockTransferLine, PriceHistory, ShopkeeperDailySales,
+    Customer,
+)
 # Register your models here.
 
-admin.site.register(Branch)
-admin.site.register(User)
-admin.site.register(Product)
-admin.site.register(Sale)
-admin.site.register(ShopkeeperPermission)
 
+class EstimatedCountPaginator(Paginator):
+    """Paginator that reads the planner's row estimate for unfiltered changelists on Postgres.
+
+    An exact COUNT(*) over a large table is a full scan; pg_class.reltuples is
+    kept fresh by autovacuum and is good enough for page links. Filtered
+    querysets and other backends still get an exact count.
+    """
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is not None and not query.where:
+            connection = connections[self.object_list.db]
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        "SELECT reltuples::bigint FROM pg_class WHERE relname = %s",
+                        [self.object_list.model._meta.db_table],
+                    )
+                    row = cursor.fetchone()
+                # reltuples is -1 (or 0) until the table has been analyzed
+                if row and row[0] > 0:
+                    return row[0]
+        return super().count
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
+
+
+@admin.register(Branch)
+class BranchAdmin(admin.ModelAdmin):
+    list_display = ('name', 'location')
+    search_fields = ('name', 'location')
+    ordering = ('name',)
+
+
+@admin.register(User)
+class UserAdmin(admin.ModelAdmin):
+    list_display = ('username', 'email', 'first_name', 'last_name', 'is_shopkeeper', 'is_owner', 'is_active')
+    list_filter = ('is_shopkeeper', 'is_owner', 'is_active', 'is_staff')
+    search_fields = ('username', 'email', 'first_name', 'last_name')
+
+
+@admin.register(Product)
+class ProductAdmin(LargeTableAdmin):
+    list_display = ('name', 'sku', 'branch', 'stock', 'cost_price', 'selling_price', 'low_stock_threshold')
+    list_select_related = ('branch',)
+    list_filter = ('branch',)
+    search_fields = ('name', 'sku')
+    autocomplete_fields = ('branch',)
+
+
+@admin.register(Sale)
+class SaleAdmin(LargeTableAdmin):
+    list_display = ('id', 'timestamp', 'product', 'quantity_sold', 'amount_paid', 'amount_left', 'mode', 'shopkeeper', 'branch')
+    list_select_related = ('product', 'shopkeeper', 'branch')
+    list_filter = ('mode', 'branch')
+    date_hierarchy = 'timestamp'
+    search_fields = ('customer_name', 'customer_contact_details')
+    autocomplete_fields = ('branch',)
+    raw_id_fields = ('product', 'shopkeeper', 'customer')
+    ordering = ('-timestamp',)
+
+
+@admin.register(ShopkeeperPermission)
+class ShopkeeperPermissionAdmin(admin.ModelAdmin):
+    list_display = ('shopkeeper', 'can_edit_stock')
+    list_select_related = ('shopkeeper',)
+    raw_id_fields = ('shopkeeper',)
+
+
+@admin.register(CustomerBalance)
+class CustomerBalanceAdmin(LargeTableAdmin):
+    list_display = ('customer_key', 'customer_name', 'opened_on', 'balance')
+    date_hierarchy = 'opened_on'
+    search_fields = ('customer_key', 'customer_name')
+
+
+@admin.register(Payment)
+class PaymentAdmin(LargeTableAdmin):
+    list_display = ('sale', 'amount', 'mode', 'received_by', 'timestamp')
+    list_select_related = ('sale', 'received_by')
+    raw_id_fields = ('sale', 'received_by')
+
+
+@admin.register(SaleArchive)
+class SaleArchiveAdmin(LargeTableAdmin):
+    list_display = ('id', 'timestamp', 'product', 'quantity_sold', 'amount_paid', 'mode', 'shopkeeper', 'branch')
+    list_select_related = ('product', 'shopkeeper', 'branch')
+    list_filter = ('mode', 'branch')
+    date_hierarchy = 'timestamp'
+    raw_id_fields = ('product', 'shopkeeper', 'customer')
+    ordering = ('-timestamp',)
+
+
+@admin.register(SalesRollup)
+class SalesRollupAdmin(admin.ModelAdmin):
+    list_display = ('month', 'branch', 'sales_count', 'quantity', 'revenue', 'cost')
+    list_select_related = ('branch',)
+    list_filter = ('branch',)
+    date_hierarchy = 'month'
+
+
+@admin.register(Stocktake)
+class StocktakeAdmin(admin.ModelAdmin):
+    list_display = ('id', 'branch', 'status', 'started_by', 'started_at', 'committed_at')
+    list_select_related = ('branch', 'started_by')
+    list_filter = ('status', 'branch')
+
+
+@admin.register(StockAdjustment)
+class StockAdjustmentAdmin(LargeTableAdmin):
+    list_display = ('product', 'reason', 'previous_stock', 'new_stock', 'stocktake', 'adjusted_by', 'timestamp')
+    list_select_related = ('product', 'stocktake', 'adjusted_by')
+    list_filter = ('reason',)
+    date_hierarchy = 'timestamp'
+    raw_id_fields = ('product', 'stocktake', 'adjusted_by')
+
+
+class StockTransferLineInline(admin.TabularInline):
+    model = StockTransferLine
+    raw_id_fields = ('source_product', 'destination_product')
+    extra = 0
+
+
+@admin.register(StockTransfer)
+class StockTransferAdmin(admin.ModelAdmin):
+    list_display = ('id', 'source', 'destination', 'status', 'dispatched_by', 'dispatched_at', 'received_at')
+    list_select_related = ('source', 'destination', 'dispatched_by')
+    list_filter = ('status', 'source', 'destination')
+    inlines = [StockTransferLineInline]
+
+
+@admin.register(PriceHistory)
+class PriceHistoryAdmin(LargeTableAdmin):
+    list_display = ('product', 'cost_price', 'selling_price', 'effective_from')
+    list_select_related = ('product',)
+    date_hierarchy = 'effective_from'
+    raw_id_fields = ('product',)
+    ordering = ('-effective_from',)
+
+
+@admin.register(ShopkeeperDailySales)
+class ShopkeeperDailySalesAdmin(LargeTableAdmin):
+    list_display = ('day', 'shopkeeper', 'sales_count', 'units', 'revenue')
+    list_select_related = ('shopkeeper',)
+    date_hierarchy = 'day'
+    raw_id_fields = ('shopkeeper',)
+    ordering = ('-day',)
+
+
+@admin.register(Customer)
+class CustomerAdmin(LargeTableAdmin):
+    list_display = ('name', 'contact', 'key', 'sales_count', 'units', 'total_paid', 'created_at')
+    search_fields = ('key', 'name', 'contact')
+    ordering = ('-total_paid',)
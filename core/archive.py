@@ -0,0 +1,219 @@
+"""Hot/archive storage for sales.
+
+Sales older than a retention window are moved from core_sale into
+SaleArchive by the archive_sales command, and their totals are folded into
+SalesRollup. The helpers here answer report queries across both, so views
+only ever scan core_sale for recent data.
+"""
+import heapq
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, time
+from operator import itemgetter
+
+from django.db import connection, transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Max, Sum
+from django.utils import timezone
+
+from .models import SaleArchive, SalesRollup, Sale
+from .pricing import price_at
+
+TOTAL_FIELDS = ('sales_count', 'quantity', 'revenue', 'amount_left', 'cost', 'list_value')
+
+_moving = ContextVar('moving_sales', default=False)
+
+ROW_FIELDS = (
+    'id', 'timestamp', 'branch_id', 'product_id', 'shopkeeper_id', 'customer_name',
+    'customer_contact_details', 'customer_id', 'quantity_sold', 'amount_paid', 'amount_left', 'mode',
+)
+
+
+def moving_sales():
+    """True while archive_sales is deleting sales it has just copied to the archive."""
+    return _moving.get()
+
+
+@contextmanager
+def _moving_sales():
+    token = _moving.set(True)
+    try:
+        yield
+    finally:
+        _moving.reset(token)
+
+
+def lock_sales():
+    """Hold off writes to hot and archived sales until the current transaction ends.
+
+    The summary rebuilds read every sale and then replace their table; a sale
+    written in between would be lost. On SQLite the transaction's own write
+    lock already keeps other writers out.
+    """
+    if connection.vendor == 'postgresql':
+        tables = ', '.join(connection.ops.quote_name(model._meta.db_table) for model in (Sale, SaleArchive))
+        with connection.cursor() as cursor:
+            cursor.execute(f'LOCK TABLE {tables} IN SHARE MODE')
+
+
+def add_months(day, months):
+    month_index = day.year * 12 + day.month - 1 + months
+    return day.replace(year=month_index // 12, month=month_index % 12 + 1, day=1)
+
+
+def day_start(day):
+    """Midnight at the start of ``day`` in the current timezone."""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def line_total(price):
+    """``price`` times the sale's quantity, as money."""
+    return ExpressionWrapper(price * F('quantity_sold'), output_field=DecimalField(max_digits=14, decimal_places=2))
+
+
+def _hot_totals(sales):
+    totals = sales.aggregate(
+        sales_count=Count('id'),
+        quantity=Sum('quantity_sold'),
+        revenue=Sum('amount_paid'),
+        amount_left=Sum('amount_left'),
+        cost=Sum(line_total(price_at('cost_price'))),
+        list_value=Sum(line_total(price_at('selling_price'))),
+    )
+    return {field: totals[field] or 0 for field in TOTAL_FIELDS}
+
+
+def _archive_totals(start, end, branch):
+    # Whole months come straight from the rollups; ragged edges fall back to the archive rows
+    if (start is None or start.day == 1) and (end is None or end.day == 1):
+        rollups = SalesRollup.objects.all()
+        if start is not None:
+            rollups = rollups.filter(month__gte=start)
+        if end is not None:
+            rollups = rollups.filter(month__lt=end)
+        if branch is not None:
+            rollups = rollups.filter(branch=branch)
+        totals = rollups.aggregate(**{field: Sum(field) for field in TOTAL_FIELDS})
+        return {field: totals[field] or 0 for field in TOTAL_FIELDS}
+
+    archived = SaleArchive.objects.all()
+    if start is not None:
+        archived = archived.filter(timestamp__gte=day_start(start))
+    if end is not None:
+        archived = archived.filter(timestamp__lt=day_start(end))
+    if branch is not None:
+        archived = archived.filter(branch=branch)
+    totals = archived.aggregate(
+        sales_count=Count('id'),
+        quantity=Sum('quantity_sold'),
+        revenue=Sum('amount_paid'),
+        amount_left=Sum('amount_left'),
+        cost=Sum(line_total(F('cost_price'))),
+        list_value=Sum(line_total(F('selling_price'))),
+    )
+    return {field: totals[field] or 0 for field in TOTAL_FIELDS}
+
+
+def archive_end():
+    """First day after the newest archived month, or None if nothing has been archived."""
+    last = SalesRollup.objects.aggregate(last=Max('month'))['last']
+    return add_months(last, 1) if last else None
+
+
+def sales_totals(start=None, end=None, branch=None):
+    """Sale totals for [start, end) (dates, either may be None) across hot and archived sales.
+
+    Returns sales_count, quantity, revenue (amount_paid), amount_left, cost
+    (cost price x quantity) and list_value (selling price x quantity).
+    """
+    sales = Sale.objects.all()
+    if start is not None:
+        sales = sales.filter(timestamp__gte=day_start(start))
+    if end is not None:
+        sales = sales.filter(timestamp__lt=day_start(end))
+    if branch is not None:
+        sales = sales.filter(branch=branch)
+    totals = _hot_totals(sales)
+
+    archived_until = archive_end()
+    if archived_until is not None and (start is None or start < archived_until):
+        archived = _archive_totals(start, end, branch)
+        totals = {field: totals[field] + archived[field] for field in TOTAL_FIELDS}
+    return totals
+
+
+def sales_rows(start=None, end=None, branch=None, fields=(), prices=True, using=None):
+    """Iterate sale rows for [start, end) from the archive and the hot table, oldest first.
+
+    Each row is a dict of ROW_FIELDS and any extra ``fields`` (related
+    lookups such as 'product__name'), plus, with ``prices``, the cost_price
+    and selling_price in force when the sale was made.
+    """
+    filters = {}
+    if start is not None:
+        filters['timestamp__gte'] = day_start(start)
+    if end is not None:
+        filters['timestamp__lt'] = day_start(end)
+    if branch is not None:
+        filters['branch'] = branch
+
+    hot_prices = {'cost_price': price_at('cost_price'), 'selling_price': price_at('selling_price')} if prices else {}
+    hot = Sale.objects.using(using).filter(**filters).order_by('timestamp', 'id').values(*ROW_FIELDS, *fields, **hot_prices)
+    archived_until = archive_end()
+    if archived_until is None or (start is not None and start >= archived_until):
+        return hot.iterator(chunk_size=2000)
+
+    archived_prices = ('cost_price', 'selling_price') if prices else ()
+    archived = SaleArchive.objects.using(using).filter(**filters).order_by('timestamp', 'id').values(*ROW_FIELDS, *fields, *archived_prices)
+    # Sales still in the hot table (credit, payments) can be older than archived ones
+    return heapq.merge(archived.iterator(chunk_size=2000), hot.iterator(chunk_size=2000), key=itemgetter('timestamp', 'id'))
+
+
+def _add_to_rollups(rows):
+    groups = {}
+    for row in rows:
+        key = (timezone.localdate(row['timestamp']).replace(day=1), row['branch_id'])
+        totals = groups.setdefault(key, dict.fromkeys(TOTAL_FIELDS, 0))
+        totals['sales_count'] += 1
+        totals['quantity'] += row['quantity_sold']
+        totals['revenue'] += row['amount_paid']
+        totals['amount_left'] += row['amount_left']
+        totals['cost'] += (row['cost_price'] or 0) * row['quantity_sold']
+        totals['list_value'] += (row['selling_price'] or 0) * row['quantity_sold']
+
+    for (month, branch_id), totals in groups.items():
+        rollup, created = SalesRollup.objects.get_or_create(month=month, branch_id=branch_id, defaults=totals)
+        if not created:
+            SalesRollup.objects.filter(pk=rollup.pk).update(**{field: F(field) + totals[field] for field in TOTAL_FIELDS})
+
+
+def archive_sales(months, batch_size=1000):
+    """Move settled sales older than ``months`` whole months into SaleArchive.
+
+    Sales with credit still outstanding or with payments recorded against
+    them stay in the hot table so receivables keep working. Each batch is
+    its own transaction, so the command can be stopped and rerun safely.
+    Returns the number of sales moved.
+    """
+    cutoff = day_start(add_months(timezone.localdate(), -months))
+    candidates = Sale.objects.filter(timestamp__lt=cutoff, amount_left=0, payments__isnull=True)
+    moved = 0
+    while True:
+        ids = list(candidates.order_by('id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return moved
+
+        with transaction.atomic():
+            # A sale may have been edited or paid on since it was picked; only
+            # move the ones that still qualify, locked until they are gone
+            ids = list(candidates.filter(id__in=ids).select_for_update(of=('self',)).values_list('id', flat=True))
+            batch = Sale.objects.filter(id__in=ids)
+            rows = list(batch.values(
+                *ROW_FIELDS, cost_price=price_at('cost_price'), selling_price=price_at('selling_price'),
+            ))
+            SaleArchive.objects.bulk_create([SaleArchive(**row) for row in rows])
+            _add_to_rollups(rows)
+            # The rows are moved, not removed: the delete signals check
+            # moving_sales() so the incremental summaries keep counting them
+            with _moving_sales():
+                batch.delete()
+        moved += len(ids)
@@ -0,0 +1,29 @@
+"""Authentication backend that loads request.user from the cache (CACHE_USERS).
+
+The default ModelBackend fetches the user row on every request. The cached
+copy is dropped by the User save/delete and group/permission signals (see
+core.signals), so password changes, deactivation and edits apply on the next
+request handled by any worker sharing the cache.
+"""
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+
+def user_cache_key(user_id):
+    return f'auth-user:{user_id}'
+
+
+class CachedModelBackend(ModelBackend):
+    def get_user(self, user_id):
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(key, user, settings.USER_CACHE_SECONDS)
+        return user
+
+
+def forget_user(user_id):
+    cache.delete(user_cache_key(user_id))
@@ -0,0 +1,303 @@
+"""Online backups of the database.
+
+SQLite is copied with its online backup API a few pages at a time,
+pausing between steps, so the tills can keep writing while a backup runs.
+Every backup records a hash of each database page. A full backup stores
+the whole (gzipped) file. An incremental one stores only the pages that
+changed since the previous backup in the chain. Restoring rebuilds the file
+from the chain and checks it against the recorded hash and SQLite's
+integrity check before anything is replaced.
+
+On PostgreSQL the same commands wrap pg_dump and pg_restore in directory
+format, which dumps and restores tables with parallel jobs.
+"""
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import struct
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils import timezone
+
+FULL = 'full'
+INCREMENTAL = 'incremental'
+POSTGRES = 'pg_dump'
+
+_PAGE_HEADER = struct.Struct('>I')
+
+
+class BackupError(Exception):
+    pass
+
+
+def _database(alias=DEFAULT_DB_ALIAS):
+    return settings.DATABASES[alias]
+
+
+def is_sqlite(alias=DEFAULT_DB_ALIAS):
+    return connections[alias].vendor == 'sqlite'
+
+
+def _manifest_path(directory, name):
+    return Path(directory) / f'{name}.json'
+
+
+def read_manifest(directory, name):
+    path = _manifest_path(directory, name)
+    if not path.exists():
+        raise BackupError(f"No backup named {name} in {directory}.")
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_manifest(directory, manifest):
+    path = _manifest_path(directory, manifest['name'])
+    tmp = path.with_suffix('.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, path)
+
+
+def list_backups(directory):
+    """Manifests in ``directory``, oldest first."""
+    manifests = []
+    for path in Path(directory).glob('*.json'):
+        with open(path) as f:
+            manifests.append(json.load(f))
+    return sorted(manifests, key=lambda manifest: manifest['created_at'])
+
+
+def _new_name(kind):
+    return f"{timezone.now():%Y%m%d-%H%M%S-%f}-{kind}"
+
+
+# SQLite
+
+class _Restarting(Exception):
+    pass
+
+
+def online_copy(source_path, target_path, pages=256, sleep=0.05, max_restarts=20, progress=None):
+    """Copy a live SQLite database with the backup API, ``pages`` pages per step.
+
+    The source is unlocked for ``sleep`` seconds after every step so writers
+    can get in. A write from another connection makes SQLite restart the
+    copy, so the result is always a consistent snapshot; if the tills are
+    busy enough to restart it ``max_restarts`` times, the rest is copied in
+    one step, which holds writers off only for as long as a plain file copy.
+    """
+    source = sqlite3.connect(f'file:{source_path}?mode=ro', uri=True)
+    target = sqlite3.connect(target_path)
+    last_remaining = None
+    restarts = 0
+
+    def step(status, remaining, total):
+        nonlocal last_remaining, restarts
+        if last_remaining is not None and remaining >= last_remaining:
+            restarts += 1
+            if restarts > max_restarts:
+                raise _Restarting
+        last_remaining = remaining
+        if progress:
+            progress(status, remaining, total)
+        time.sleep(sleep)
+
+    try:
+        try:
+            source.backup(target, pages=pages, progress=step)
+        except _Restarting:
+            source.backup(target)
+    finally:
+        target.close()
+        source.close()
+
+
+def check_integrity(path):
+    connection = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    try:
+        result = connection.execute('PRAGMA integrity_check').fetchone()[0]
+    finally:
+        connection.close()
+    if result != 'ok':
+        raise BackupError(f"Integrity check failed for {path}: {result}")
+
+
+def _page_size(path):
+    with open(path, 'rb') as f:
+        header = f.read(100)
+    size = int.from_bytes(header[16:18], 'big')
+    # A stored value of 1 means 65536
+    return 65536 if size == 1 else size
+
+
+def _pages(path, page_size):
+    with open(path, 'rb') as f:
+        while page := f.read(page_size):
+            yield page
+
+
+def _page_hash(page):
+    return hashlib.blake2b(page, digest_size=16).hexdigest()
+
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(1 << 20):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _describe(path):
+    page_size = _page_size(path)
+    return {
+        'page_size': page_size,
+        'pages': [_page_hash(page) for page in _pages(path, page_size)],
+        'sha256': _file_hash(path),
+    }
+
+
+def backup_sqlite(directory, incremental=False, pages=256, sleep=0.05, max_restarts=20, progress=None):
+    """Take a full or incremental backup of the default SQLite database into ``directory``.
+
+    An incremental backup needs an earlier SQLite backup in ``directory``
+    with the same page size; otherwise a full one is taken. Returns the manifest.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    previous = next((m for m in reversed(list_backups(directory)) if m['kind'] in (FULL, INCREMENTAL)), None)
+
+    with tempfile.TemporaryDirectory(dir=directory) as scratch:
+        snapshot = Path(scratch) / 'snapshot.sqlite3'
+        online_copy(_database()['NAME'], snapshot, pages=pages, sleep=sleep, max_restarts=max_restarts, progress=progress)
+        check_integrity(snapshot)
+        description = _describe(snapshot)
+
+        if incremental and previous and previous['page_size'] == description['page_size']:
+            kind, base = INCREMENTAL, previous['name']
+            name = _new_name(kind)
+            data_file = f'{name}.pages.gz'
+            changed = 0
+            with gzip.open(directory / data_file, 'wb') as out:
+                for number, (page, page_hash) in enumerate(zip(_pages(snapshot, description['page_size']), description['pages'])):
+                    if number < len(previous['pages']) and previous['pages'][number] == page_hash:
+                        continue
+                    out.write(_PAGE_HEADER.pack(number))
+                    out.write(page)
+                    changed += 1
+        else:
+            kind, base = FULL, None
+            name = _new_name(kind)
+            data_file = f'{name}.sqlite3.gz'
+            with open(snapshot, 'rb') as source, gzip.open(directory / data_file, 'wb') as out:
+                shutil.copyfileobj(source, out, 1 << 20)
+            changed = len(description['pages'])
+
+    manifest = {
+        'name': name,
+        'kind': kind,
+        'base': base,
+        'created_at': timezone.now().isoformat(),
+        'file': data_file,
+        'pages_written': changed,
+        **description,
+    }
+    _write_manifest(directory, manifest)
+    return manifest
+
+
+def _chain(directory, name):
+    chain = [read_manifest(directory, name)]
+    while chain[-1]['base']:
+        chain.append(read_manifest(directory, chain[-1]['base']))
+    return list(reversed(chain))
+
+
+def rebuild_sqlite(directory, name, target_path):
+    """Rebuild backup ``name`` (and its chain) into ``target_path`` and verify it."""
+    directory = Path(directory)
+    chain = _chain(directory, name)
+    if chain[0]['kind'] != FULL:
+        raise BackupError(f"{name} is not a SQLite backup.")
+    with gzip.open(directory / chain[0]['file'], 'rb') as source, open(target_path, 'wb') as out:
+        shutil.copyfileobj(source, out, 1 << 20)
+
+    with open(target_path, 'r+b') as out:
+        for manifest in chain[1:]:
+            page_size = manifest['page_size']
+            with gzip.open(directory / manifest['file'], 'rb') as deltas:
+                while header := deltas.read(_PAGE_HEADER.size):
+                    (number,) = _PAGE_HEADER.unpack(header)
+                    out.seek(number * page_size)
+                    out.write(deltas.read(page_size))
+            out.truncate(len(manifest['pages']) * page_size)
+
+    if _file_hash(target_path) != chain[-1]['sha256']:
+        raise BackupError(f"Restored file does not match backup {name}.")
+    check_integrity(target_path)
+
+
+def restore_sqlite(directory, name, target_path=None):
+    """Verify backup ``name`` and copy it over ``target_path`` (default: the live database).
+
+    The copy goes through the backup API in a single step, so open
+    connections see either the old data or the restored data, never a mix.
+    """
+    target_path = target_path or _database()['NAME']
+    with tempfile.TemporaryDirectory(dir=Path(target_path).parent) as scratch:
+        restored = Path(scratch) / 'restored.sqlite3'
+        rebuild_sqlite(directory, name, restored)
+        source = sqlite3.connect(restored)
+        target = sqlite3.connect(target_path)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
+
+
+# PostgreSQL
+
+def _pg_env(database):
+    env = {**os.environ, 'PGDATABASE': database['NAME']}
+    for key, variable in (('USER', 'PGUSER'), ('PASSWORD', 'PGPASSWORD'), ('HOST', 'PGHOST'), ('PORT', 'PGPORT')):
+        if database.get(key):
+            env[variable] = str(database[key])
+    return env
+
+
+def backup_postgres(directory, jobs=4):
+    """pg_dump the default database in directory format with ``jobs`` parallel workers."""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    name = _new_name(POSTGRES)
+    subprocess.run(
+        ['pg_dump', '--format=directory', f'--jobs={jobs}', '--compress=6', f'--file={directory / name}'],
+        env=_pg_env(_database()), check=True,
+    )
+    # Reading the table of contents back catches a truncated or unreadable dump
+    subprocess.run(['pg_restore', '--list', str(directory / name)], stdout=subprocess.DEVNULL, check=True)
+    manifest = {'name': name, 'kind': POSTGRES, 'base': None, 'created_at': timezone.now().isoformat(), 'file': name}
+    _write_manifest(directory, manifest)
+    return manifest
+
+
+def restore_postgres(directory, name, jobs=4):
+    manifest = read_manifest(directory, name)
+    if manifest['kind'] != POSTGRES:
+        raise BackupError(f"{name} is not a pg_dump backup.")
+    dump = Path(directory) / manifest['file']
+    subprocess.run(['pg_restore', '--list', str(dump)], stdout=subprocess.DEVNULL, check=True)
+    database = _database()
+    subprocess.run(
+        ['pg_restore', '--clean', '--if-exists', '--no-owner', f'--jobs={jobs}', f'--dbname={database["NAME"]}', str(dump)],
+        env=_pg_env(database), check=True,
+    )
@@ -0,0 +1,444 @@
+"""Local benchmark harness.
+
+Suites are registered with ``@suite`` and run by the run_benchmarks
+command against whatever database is configured, normally one filled by
+seed_benchmark_data. Each suite returns a dict of named cases, and each
+case is a dict of metrics (latency percentiles in ms, query counts, peak
+memory in KiB, ...). Results are written as JSON and compared with a saved
+baseline so slowdowns show up before they reach the tills.
+"""
+import json
+import os
+import random
+import re
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.db import OperationalError, connection, connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import URLPattern, get_resolver
+
+SUITES = {}
+
+# Metrics where a bigger number is worse, and how each one is compared
+LATENCY_METRICS = ('p50_ms', 'p95_ms', 'p99_ms', 'seconds', 'import_ms')
+EXACT_METRICS = ('queries', 'units_lost')
+MEMORY_METRICS = ('peak_kib',)
+SIZE_METRICS = ('html_bytes', 'wire_bytes', 'static_bytes')
+
+# Routes that change data on GET or end the session
+UNSAFE_ROUTES = {'logout', 'delete_sale', 'delete_product', 'delete_branch', 'toggle_stock_permission'}
+
+BENCH_USERNAME = 'bench_owner'
+
+
+def suite(name):
+    def register(func):
+        SUITES[name] = func
+        return func
+    return register
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+
+    def pick(fraction):
+        return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000, 3)
+
+    return {
+        'p50_ms': pick(0.50),
+        'p95_ms': pick(0.95),
+        'p99_ms': pick(0.99),
+        'mean_ms': round(statistics.fmean(ordered) * 1000, 3),
+    }
+
+
+def measure(func, repeat=20, warmup=2):
+    """Time ``func`` and record its query count and peak traced memory."""
+    for _ in range(warmup):
+        func()
+
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+
+    # One extra traced run: tracemalloc and query capture would skew the timings
+    tracemalloc.start()
+    try:
+        with CaptureQueriesContext(connection) as queries:
+            func()
+        _current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {**percentiles(samples), 'queries': len(queries), 'peak_kib': round(peak / 1024, 1), 'runs': repeat}
+
+
+def bench_client(username=BENCH_USERNAME):
+    from .models import User
+
+    client = Client(HTTP_HOST='localhost', raise_request_exception=False)
+    client.force_login(User.objects.get(username=username))
+    return client
+
+
+def route_urls():
+    """A concrete URL for every GET-safe named route in core.urls.
+
+    Path arguments are filled from the newest sample object of each kind;
+    a route is skipped when the database has none yet (run the transfers
+    suite or start a stocktake to include those pages).
+    """
+    from .models import Branch, Customer, Product, Sale, Stocktake, StockTransfer, User
+
+    def newest(queryset):
+        return queryset.order_by('-id').values_list('id', flat=True).first()
+
+    samples = {
+        'product_id': newest(Product.objects.all()),
+        'sale_id': newest(Sale.objects.all()),
+        'branch_id': newest(Branch.objects.all()),
+        'user_id': newest(User.objects.filter(groups__name='Shopkeeper')),
+        'customer_id': newest(Customer.objects.all()),
+        'stocktake_id': newest(Stocktake.objects.all()),
+        'transfer_id': newest(StockTransfer.objects.all()),
+        # The all-time revenue tile aggregates both sales tables
+        'kpi': 'total_revenue',
+    }
+    urls = {}
+    for pattern in get_resolver('core.urls').url_patterns:
+        if not isinstance(pattern, URLPattern) or not pattern.name or pattern.name in UNSAFE_ROUTES:
+            continue
+        kwargs = {name: samples.get(name) for name in pattern.pattern.converters}
+        if None in kwargs.values():
+            continue
+        route = re.sub(r'<(?:\w+:)?(\w+)>', lambda match: str(kwargs[match.group(1)]), str(pattern.pattern))
+        urls.setdefault(pattern.name, '/' + route)
+    return urls
+
+
+@suite('routes')
+def routes_suite(repeat=20, concurrency=1, **options):
+    """GET every route in core.urls as the benchmark owner."""
+    client = bench_client()
+    results = {}
+    for name, url in route_urls().items():
+        statuses = set()
+
+        def request():
+            statuses.add(client.get(url).status_code)
+
+        results[name] = {'url': url, **measure(request, repeat=repeat)}
+        results[name]['status'] = sorted(statuses)
+
+    if concurrency > 1:
+        results.update(load_test(route_urls(), concurrency=concurrency, requests=repeat * concurrency))
+    return results
+
+
+PAGE_WEIGHT_ROUTES = ('owner_dashboard', 'shopkeeper_dashboard', 'add_sale', 'manage_sales')
+
+
+def _static_bytes(html):
+    # Bytes of our own static assets the page pulls in, as WhiteNoise would send them compressed
+    total = 0
+    for name in set(re.findall(r'(?:src|href)="%s([^"]+)"' % re.escape(settings.STATIC_URL), html)):
+        for candidate in (name + '.br', name + '.gz', name):
+            if staticfiles_storage.exists(candidate):
+                total += staticfiles_storage.size(candidate)
+                break
+    return total
+
+
+@suite('page_weight')
+def page_weight_suite(**options):
+    """Bytes per dashboard page: raw HTML, HTML on the wire to a gzip-capable browser, and local static assets."""
+    client = bench_client()
+    urls = route_urls()
+    results = {}
+    for name in PAGE_WEIGHT_ROUTES:
+        plain = client.get(urls[name])
+        compressed = client.get(urls[name], HTTP_ACCEPT_ENCODING='gzip, deflate, br')
+        wire = b''.join(compressed.streaming_content) if compressed.streaming else compressed.content
+        html = plain.content.decode()
+        results[name] = {
+            'url': urls[name],
+            'html_bytes': len(plain.content),
+            'wire_bytes': len(wire),
+            'static_bytes': _static_bytes(html),
+        }
+    return results
+
+
+REQUEST_OVERHEAD_ROUTES = ('shopkeeper_dashboard', 'manage_sales')
+SESSION_STRATEGIES = ('db', 'cached_db', 'signed_cookies')
+USER_LOADERS = {
+    'model_user': 'django.contrib.auth.backends.ModelBackend',
+    'cached_user': 'core.backends.CachedModelBackend',
+}
+
+
+@suite('request_overhead')
+def request_overhead_suite(repeat=20, **options):
+    """Queries and latency per request for each session strategy, with and without the cached user loader."""
+    urls = route_urls()
+    results = {}
+    for strategy in SESSION_STRATEGIES:
+        for loader, backend in USER_LOADERS.items():
+            with override_settings(
+                SESSION_ENGINE=f'django.contrib.sessions.backends.{strategy}',
+                AUTHENTICATION_BACKENDS=[backend],
+            ):
+                cache.clear()
+                client = bench_client()
+                for name in REQUEST_OVERHEAD_ROUTES:
+                    url = urls[name]
+                    results[f'{name} {strategy} {loader}'] = {'url': url, **measure(lambda: client.get(url), repeat=repeat)}
+    return results
+
+
+# What a gunicorn worker does before its first request: load the WSGI app, then warm up
+STARTUP_SCRIPT = """
+import time
+start = time.perf_counter()
+from fits_and_fragrances_manager.wsgi import application
+loaded = time.perf_counter()
+from core.warmup import warm_up
+warm_up()
+print(loaded - start, time.perf_counter() - loaded)
+"""
+
+
+def _import_times(log):
+    """Self time per top-level package, in ms, from ``-X importtime`` output."""
+    totals = {}
+    for line in log.splitlines():
+        match = re.match(r'import time:\s+(\d+) \|\s+\d+ \|\s*(\S+)', line)
+        if match:
+            package = match.group(2).split('.')[0]
+            totals[package] = totals.get(package, 0) + int(match.group(1)) / 1000
+    return totals
+
+
+@suite('startup')
+def startup_suite(repeat=20, **options):
+    """Cold start of a fresh interpreter: app load and warm-up times, plus import time per package.
+
+    The full ``-X importtime`` log of the last run is written next to the results.
+    """
+    env = {**os.environ, 'DJANGO_SETTINGS_MODULE': 'fits_and_fragrances_manager.settings'}
+    load, warm = [], []
+    for _ in range(min(repeat, 5)):
+        process = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', STARTUP_SCRIPT],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, check=True,
+        )
+        load_seconds, warm_seconds = map(float, process.stdout.split()[-2:])
+        load.append(load_seconds)
+        warm.append(warm_seconds)
+
+    log_path = Path(settings.BENCHMARK_DIR) / 'importtime.log'
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    log_path.write_text(process.stderr)
+
+    results = {
+        'load_app': {'seconds': round(statistics.median(load), 3)},
+        'warm_up': {'seconds': round(statistics.median(warm), 3)},
+    }
+    packages = sorted(_import_times(process.stderr).items(), key=lambda item: -item[1])
+    for package, ms in packages[:15]:
+        results[f'import {package}'] = {'import_ms': round(ms, 1)}
+    return results
+
+
+TRANSFER_PRODUCTS = 2000
+
+
+@suite('transfers')
+def transfers_suite(concurrency=1, **options):
+    """Dispatch and receive a transfer of every product in a scratch branch while tills keep selling from it.
+
+    Also checks that no unit of stock was lost or double-counted. The scratch
+    branches, with their products, sales and transfers, are deleted afterwards.
+    """
+    from . import inventory, transfers
+    from .models import Branch, Product
+    from .pricing import record_initial_prices
+
+    source = Branch.objects.create(name='bench transfer source', location='bench')
+    destination = Branch.objects.create(name='bench transfer destination', location='bench')
+    try:
+        record_initial_prices(Product.objects.bulk_create([
+            Product(
+                name=f'Transfer item {i}', sku=f'bench-transfer-{i:06d}', stock=100,
+                cost_price=Decimal('10.00'), selling_price=Decimal('15.00'), branch=source,
+            )
+            for i in range(TRANSFER_PRODUCTS)
+        ], batch_size=1000))
+        skus = list(Product.objects.filter(branch=source).values_list('sku', flat=True))
+        stop = threading.Event()
+
+        def till(seed):
+            rng = random.Random(seed)
+            sold = failed = 0
+            try:
+                while not stop.is_set():
+                    try:
+                        inventory.sell_by_sku(rng.choice(skus), source, 1, 'cash')
+                        sold += 1
+                    except (inventory.OutOfStock, OperationalError):
+                        failed += 1
+            finally:
+                connections.close_all()
+            return sold, failed
+
+        tills = max(2, concurrency)
+        with ThreadPoolExecutor(max_workers=tills) as pool:
+            futures = [pool.submit(till, seed) for seed in range(tills)]
+            time.sleep(0.2)
+            quantities = {pk: 10 for pk in Product.objects.filter(branch=source).values_list('id', flat=True)}
+
+            try:
+                start = time.perf_counter()
+                transfer = transfers.dispatch(source, destination, quantities)
+                dispatched = time.perf_counter()
+                transfers.receive(transfer)
+                received = time.perf_counter()
+            finally:
+                stop.set()
+            tallies = [future.result() for future in futures]
+        elapsed = time.perf_counter() - start
+
+        sold = sum(count for count, _failed in tallies)
+        on_hand = Product.objects.filter(branch__in=[source, destination]).values_list('stock', flat=True)
+        return {
+            'dispatch': {'seconds': round(dispatched - start, 3), 'lines': len(quantities)},
+            'receive': {'seconds': round(received - dispatched, 3), 'lines': len(quantities)},
+            'concurrent_sales': {
+                'sales': sold,
+                'failed': sum(failed for _sold, failed in tallies),
+                'sales_per_second': round(sold / elapsed, 1),
+                'units_lost': TRANSFER_PRODUCTS * 100 - sold - sum(on_hand),
+            },
+        }
+    finally:
+        source.delete()
+        destination.delete()
+
+
+@suite('year_end')
+def year_end_suite(repeat=20, **options):
+    """Last year's all-branch report with 1, 2, 4, ... worker processes, up to one per CPU.
+
+    ``speedup`` is relative to a single in-process worker; ``matches`` checks
+    the parallel report came out identical.
+    """
+    from django.utils import timezone
+
+    from .yearend import year_end_report
+
+    year = timezone.localdate().year - 1
+    counts = [1]
+    while counts[-1] * 2 <= max(2, os.cpu_count() or 1):
+        counts.append(counts[-1] * 2)
+
+    results = {}
+    expected = None
+    for workers in counts:
+        samples = []
+        for _ in range(min(repeat, 3)):
+            start = time.perf_counter()
+            report = year_end_report(year, workers=workers)
+            samples.append(time.perf_counter() - start)
+        expected = expected or report
+        seconds = statistics.median(samples)
+        results[f'{workers} worker(s)'] = {
+            'seconds': round(seconds, 3),
+            'speedup': round(results['1 worker(s)']['seconds'] / seconds, 2) if workers > 1 else 1.0,
+            'matches': report == expected,
+            'sales': report['totals']['sales_count'],
+        }
+    return results
+
+
+def load_test(urls, concurrency, requests):
+    """Hit every URL from ``concurrency`` threads, each with its own client and DB connection."""
+    results = {}
+    for name, url in urls.items():
+        def worker(count):
+            client = bench_client()
+            samples = []
+            try:
+                for _ in range(count):
+                    start = time.perf_counter()
+                    client.get(url)
+                    samples.append(time.perf_counter() - start)
+            finally:
+                connections.close_all()
+            return samples
+
+        per_thread = max(1, requests // concurrency)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            samples = [sample for chunk in pool.map(worker, [per_thread] * concurrency) for sample in chunk]
+        elapsed = time.perf_counter() - start
+        results[f'{name} x{concurrency}'] = {
+            'url': url,
+            **percentiles(samples),
+            'requests_per_second': round(len(samples) / elapsed, 1),
+        }
+    return results
+
+
+def compare(results, baseline, threshold):
+    """List the metrics in ``results`` that regressed against ``baseline``.
+
+    Latency, memory and page size regress when they grow by more than ``threshold``
+    (0.2 = 20%); query counts regress on any increase.
+    """
+    regressions = []
+    for suite_name, cases in results.items():
+        for case, metrics in cases.items():
+            before = baseline.get(suite_name, {}).get(case)
+            if not before:
+                continue
+            for metric, value in metrics.items():
+                old = before.get(metric)
+                if not isinstance(value, (int, float)) or not isinstance(old, (int, float)):
+                    continue
+                if metric in EXACT_METRICS:
+                    worse = value > old
+                elif metric in LATENCY_METRICS or metric in MEMORY_METRICS or metric in SIZE_METRICS:
+                    worse = old > 0 and value > old * (1 + threshold)
+                else:
+                    continue
+                if worse:
+                    regressions.append(f'{suite_name}/{case} {metric}: {old} -> {value}')
+    return regressions
+
+
+def load_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_json(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
@@ -0,0 +1,169 @@
+"""Customers behind the free-text name and contact on sales.
+
+Sales name their customer in two free-text fields. Each sale is linked to
+one Customer row, found by receivables.customer_key, when it is saved.
+Existing sales are linked in batches by ``backfill``. A customer's history
+is then an index range scan on (customer, timestamp) instead of an
+``icontains`` over every sale. The lifetime totals on Customer move with
+sale saves, deletes and payments. Archived sales keep counting, as for the
+other summaries.
+"""
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DecimalField, F, IntegerField, Max, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from . import archive, receivables
+from .models import Customer, Sale, SaleArchive
+
+CONTACT_FIELDS = ('customer_name', 'customer_contact_details')
+CUSTOMER_FIELDS = ('customer_id', 'quantity_sold', 'amount_paid')
+HISTORY_FIELDS = ('id', 'timestamp', 'product__name', 'quantity_sold', 'amount_paid', 'amount_left', 'mode', 'branch__name')
+
+
+def customer_for(name, contact):
+    """The Customer for a sale's name and contact, created if new; None if both are blank."""
+    key = receivables.customer_key(name, contact)
+    if not key:
+        return None
+    customer = Customer.objects.filter(key=key).first()
+    if customer is None:
+        try:
+            with transaction.atomic():
+                return Customer.objects.create(key=key, name=name or '', contact=contact or '')
+        except IntegrityError:
+            # Another till created them first
+            customer = Customer.objects.get(key=key)
+
+    labels = {}
+    if name and not customer.name:
+        labels['name'] = name
+    if contact and not customer.contact:
+        labels['contact'] = contact
+    if labels:
+        Customer.objects.filter(pk=customer.pk).update(**labels)
+    return customer
+
+
+def assign_customer(sale, loaded=None):
+    """Point ``sale.customer`` at the customer its name and contact identify."""
+    if sale.customer_id and loaded and all(loaded.get(field) == getattr(sale, field) for field in CONTACT_FIELDS):
+        return
+    sale.customer = customer_for(sale.customer_name, sale.customer_contact_details)
+
+
+def sale_values(sale):
+    return {field: getattr(sale, field) for field in CUSTOMER_FIELDS}
+
+
+def adjust(customer_id, sales_count=0, units=0, paid=0):
+    if customer_id is None or not (sales_count or units or paid):
+        return
+    Customer.objects.filter(pk=customer_id).update(
+        sales_count=F('sales_count') + sales_count,
+        units=F('units') + units,
+        total_paid=F('total_paid') + paid,
+    )
+
+
+def record_sale_change(old, new):
+    """Move a sale's contribution from its old values to its new ones (either may be None)."""
+    for values, sign in ((old, -1), (new, 1)):
+        if values:
+            adjust(values['customer_id'], sign, sign * values['quantity_sold'], sign * values['amount_paid'])
+
+
+def record_payment(sale, amount):
+    adjust(sale.customer_id, paid=amount)
+
+
+def _create_customers(model):
+    # The latest name and contact seen for each key label the customer
+    pairs = model.objects.exclude(
+        Q(customer_name__isnull=True) | Q(customer_name=''), Q(customer_contact_details__isnull=True) | Q(customer_contact_details=''),
+    ).values_list(*CONTACT_FIELDS).annotate(last=Max('timestamp')).order_by('last')
+    customers = {}
+    for name, contact, _last in pairs.iterator(chunk_size=5000):
+        key = receivables.customer_key(name, contact)
+        if key:
+            customers[key] = Customer(key=key, name=name or '', contact=contact or '')
+    Customer.objects.bulk_create(customers.values(), batch_size=1000, ignore_conflicts=True)
+
+
+def _link_sales(model, batch_size):
+    keys = dict(Customer.objects.values_list('key', 'id'))
+    unlinked = model.objects.filter(customer__isnull=True).exclude(
+        Q(customer_name__isnull=True) | Q(customer_name=''), Q(customer_contact_details__isnull=True) | Q(customer_contact_details=''),
+    ).order_by('id')
+    linked = 0
+    last_id = None
+    while True:
+        batch = unlinked if last_id is None else unlinked.filter(id__gt=last_id)
+        rows = list(batch.values_list('id', *CONTACT_FIELDS)[:batch_size])
+        if not rows:
+            return linked
+        last_id = rows[-1][0]
+        sales = [
+            model(id=sale_id, customer_id=keys[key])
+            for sale_id, name, contact in rows
+            if (key := receivables.customer_key(name, contact)) in keys
+        ]
+        with transaction.atomic():
+            model.objects.bulk_update(sales, ['customer'], batch_size=batch_size)
+        linked += len(sales)
+
+
+def _lifetime(model, aggregate, output_field):
+    per_customer = model.objects.filter(customer=OuterRef('pk')).values('customer').annotate(total=aggregate).values('total')
+    return Coalesce(Subquery(per_customer, output_field=output_field), Value(0), output_field=output_field)
+
+
+def rebuild_totals():
+    """Recompute every customer's lifetime totals from hot and archived sales in one UPDATE."""
+    totals = {
+        'sales_count': (Count('id'), IntegerField()),
+        'units': (Sum('quantity_sold'), IntegerField()),
+        'total_paid': (Sum('amount_paid'), DecimalField(max_digits=14, decimal_places=2)),
+    }
+    with transaction.atomic():
+        archive.lock_sales()
+        return Customer.objects.update(**{
+            field: _lifetime(Sale, aggregate, output_field) + _lifetime(SaleArchive, aggregate, output_field)
+            for field, (aggregate, output_field) in totals.items()
+        })
+
+
+def backfill(batch_size=2000):
+    """Create customers for every name/contact on existing sales and link the sales to them.
+
+    Sales that share a contact (or, without one, a name) share a customer.
+    Linking runs in batches of ``batch_size``, each in its own transaction,
+    so it can be stopped and rerun. Returns (customers, sales linked).
+    """
+    for model in (SaleArchive, Sale):
+        _create_customers(model)
+    linked = sum(_link_sales(model, batch_size) for model in (SaleArchive, Sale))
+    rebuild_totals()
+    return Customer.objects.count(), linked
+
+
+def search(query):
+    """Customers whose contact digits start with, or whose name contains, ``query``."""
+    key = receivables.customer_key(None, query)
+    condition = Q(name__icontains=query.strip())
+    if key.isdigit():
+        condition |= Q(key__startswith=key)
+        # customer_key only drops the country code from whole numbers, so do
+        # it here for a partial one such as '+233 24'
+        code = settings.PHONE_COUNTRY_CODE
+        local = key[2:] if code and key.startswith('00' + code) else key
+        if code and local.startswith(code):
+            condition |= Q(key__startswith='0' + local[len(code):])
+    return Customer.objects.filter(condition).order_by('-total_paid')
+
+
+def history(customer):
+    """Every hot and archived sale of ``customer``, newest first."""
+    hot = Sale.objects.filter(customer=customer).values(*HISTORY_FIELDS)
+    archived = SaleArchive.objects.filter(customer=customer).values(*HISTORY_FIELDS)
+    return hot.union(archived, all=True).order_by('-timestamp', '-id')
@@ -1,7 +1,10 @@
+from decimal import Decimal
+
 from django import forms 
-from .models import User,Product, Sale, Branch
+from .models import User,Product, Sale, Branch, Payment, Stocktake
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
 from django.contrib.auth import get_user_model
+from . import repricing
 
 User = get_user_model()
 
@@ -34,7 +37,7 @@ class SaleForm( forms.ModelForm):
 class ProductForm(forms.ModelForm):
     class Meta:
         model =  Product 
-        fields = ['name','cost_price','selling_price','stock','low_stock_threshold','branch']
+        fields = ['name','sku','cost_price','selling_price','stock','low_stock_threshold','branch']
         
 
 class BranchForm(forms.ModelForm):
@@ -43,3 +46,65 @@ class BranchForm(forms.ModelForm):
         fields = ['name', 'location']
         
 
+
+class PaymentForm(forms.ModelForm):
+    class Meta:
+        model = Payment
+        fields = ['amount', 'mode']
+
+
+class ScanSaleForm(forms.Form):
+    sku = forms.CharField(max_length=64)
+    branch = forms.ModelChoiceField(queryset=Branch.objects.all())
+    quantity = forms.IntegerField(min_value=1, initial=1)
+    mode = forms.ChoiceField(choices=Sale.MODES_OF_PAYMENT)
+
+
+class StocktakeForm(forms.ModelForm):
+    class Meta:
+        model = Stocktake
+        fields = ['branch']
+
+
+class StockCountUploadForm(forms.Form):
+    file = forms.FileField(help_text="CSV with one sku,counted line per product")
+
+
+class StockCountScanForm(forms.Form):
+    sku = forms.CharField(max_length=64)
+    quantity = forms.IntegerField(min_value=1, initial=1)
+
+
+class StockTransferForm(forms.Form):
+    source = forms.ModelChoiceField(queryset=Branch.objects.all())
+    destination = forms.ModelChoiceField(queryset=Branch.objects.all())
+    file = forms.FileField(help_text="CSV with one sku,quantity line per product to send")
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get('source') and cleaned_data.get('source') == cleaned_data.get('destination'):
+            raise forms.ValidationError("Source and destination must be different branches.")
+        return cleaned_data
+
+
+class RepricingForm(forms.Form):
+    branch = forms.ModelChoiceField(queryset=Branch.objects.all(), required=False, empty_label="All branches")
+    name = forms.CharField(max_length=50, required=False, help_text="Only products whose name contains this")
+    min_margin = forms.DecimalField(required=False, help_text="Current margin over cost, in %")
+    max_margin = forms.DecimalField(required=False)
+    base = forms.ChoiceField(choices=repricing.BASES)
+    mode = forms.ChoiceField(choices=repricing.MODES)
+    amount = forms.DecimalField(max_digits=10, decimal_places=2, help_text="Percent or amount to add; negative to lower prices")
+    rounding = forms.ChoiceField(choices=repricing.ROUNDING)
+    step = forms.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0.01'), initial=Decimal('1.00'))
+    floor_at_cost = forms.BooleanField(required=False, initial=True, label="Never price below cost")
+
+    def products(self):
+        data = self.cleaned_data
+        return repricing.select_products(data['branch'], data['name'], data['min_margin'], data['max_margin'])
+
+    def price(self):
+        data = self.cleaned_data
+        return repricing.price_expression(
+            data['amount'], data['mode'], data['base'], data['rounding'], data['step'], data['floor_at_cost'],
+        )
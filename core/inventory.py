@@ -0,0 +1,35 @@
+from django.db import transaction
+from django.db.models import F
+
+from .models import Product, Sale
+
+
+class OutOfStock(Exception):
+    pass
+
+
+def sell_by_sku(sku, branch, quantity, mode, shopkeeper=None):
+    """Sell a scanned item: resolve the barcode, take the stock and record the sale.
+
+    The (branch, sku) lookup is served by the unique index, and the stock is
+    decremented with a conditional UPDATE so two tills can't oversell.
+    Raises Product.DoesNotExist for an unknown barcode and OutOfStock when the
+    branch has fewer than ``quantity`` left.
+    """
+    product = Product.objects.only('id', 'name', 'selling_price', 'branch_id').get(branch=branch, sku=sku.strip())
+
+    with transaction.atomic():
+        taken = Product.objects.filter(pk=product.pk, stock__gte=quantity).update(stock=F('stock') - quantity)
+        if not taken:
+            raise OutOfStock(f'Insufficient stock for {product.name}.')
+
+        sale = Sale.objects.create(
+            product=product,
+            quantity_sold=quantity,
+            amount_paid=product.selling_price * quantity,
+            amount_left=0,
+            mode=mode,
+            shopkeeper=shopkeeper,
+            branch_id=product.branch_id,
+        )
+    return sale
@@ -0,0 +1,113 @@
+"""Shopkeeper leaderboard backed by per-day summaries.
+
+ShopkeeperDailySales holds one row per shopkeeper per day, kept up to date
+from Sale saves and deletes (core.signals) and payments on credit sales.
+Ranking any period is then a single GROUP BY over a day range of that
+table instead of a scan of every sale. Archived sales keep counting:
+the delete signal skips sales that archive_sales is moving.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from . import archive
+from .models import Sale, SaleArchive, ShopkeeperDailySales
+
+LEADERBOARD_FIELDS = ('shopkeeper_id', 'timestamp', 'quantity_sold', 'amount_paid')
+
+RANKINGS = [
+    ('revenue', 'Revenue'),
+    ('units', 'Units sold'),
+    ('average_basket', 'Average basket'),
+    ('sales_count', 'Number of sales'),
+]
+
+
+def sale_values(sale):
+    return {field: getattr(sale, field) for field in LEADERBOARD_FIELDS}
+
+
+def adjust(shopkeeper_id, day, sales_count=0, units=0, revenue=0):
+    """Add to a shopkeeper's totals for ``day``, creating the row if needed."""
+    if shopkeeper_id is None or not (sales_count or units or revenue):
+        return
+    lookup = ShopkeeperDailySales.objects.filter(shopkeeper_id=shopkeeper_id, day=day)
+    changes = {
+        'sales_count': F('sales_count') + sales_count,
+        'units': F('units') + units,
+        'revenue': F('revenue') + revenue,
+    }
+    if lookup.update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            ShopkeeperDailySales.objects.create(
+                shopkeeper_id=shopkeeper_id, day=day, sales_count=sales_count, units=units, revenue=revenue,
+            )
+    except IntegrityError:
+        # Another request created the row first
+        lookup.update(**changes)
+
+
+def record_sale_change(old, new):
+    """Move a sale's contribution from its old values to its new ones (either may be None)."""
+    for values, sign in ((old, -1), (new, 1)):
+        if not values or values.get('timestamp') is None:
+            continue
+        adjust(
+            values['shopkeeper_id'],
+            timezone.localdate(values['timestamp']),
+            sales_count=sign,
+            units=sign * values['quantity_sold'],
+            revenue=sign * values['amount_paid'],
+        )
+
+
+def record_payment(sale, amount):
+    # Money collected later on a credit sale counts for whoever made the sale
+    adjust(sale.shopkeeper_id, timezone.localdate(sale.timestamp), revenue=amount)
+
+
+def _daily_totals(model):
+    return model.objects.filter(shopkeeper__isnull=False).annotate(
+        day=TruncDate('timestamp'),
+    ).values('shopkeeper_id', 'day').annotate(
+        sales_count=Count('id'),
+        units=Sum('quantity_sold'),
+        revenue=Sum('amount_paid'),
+    ).order_by()
+
+
+def rebuild():
+    """Recompute every summary row from hot and archived sales. Used for the initial backfill."""
+    with transaction.atomic():
+        archive.lock_sales()
+        totals = {}
+        for model in (SaleArchive, Sale):
+            for row in _daily_totals(model).iterator(chunk_size=2000):
+                key = (row['shopkeeper_id'], row['day'])
+                current = totals.setdefault(key, {'sales_count': 0, 'units': 0, 'revenue': 0})
+                for field in current:
+                    current[field] += row[field]
+
+        ShopkeeperDailySales.objects.all().delete()
+        ShopkeeperDailySales.objects.bulk_create(
+            [ShopkeeperDailySales(shopkeeper_id=shopkeeper_id, day=day, **values) for (shopkeeper_id, day), values in totals.items()],
+            batch_size=1000,
+        )
+    return len(totals)
+
+
+def ranking(start, end, order_by='revenue', limit=None):
+    """Shopkeepers ranked over [start, end) (dates) by ``order_by``, one of RANKINGS."""
+    rows = ShopkeeperDailySales.objects.filter(day__gte=start, day__lt=end).values(
+        'shopkeeper_id', 'shopkeeper__username', 'shopkeeper__first_name', 'shopkeeper__last_name',
+    ).annotate(
+        revenue=Sum('revenue'),
+        units=Sum('units'),
+        sales_count=Sum('sales_count'),
+    ).filter(sales_count__gt=0).annotate(
+        average_basket=ExpressionWrapper(F('revenue') / F('sales_count'), output_field=DecimalField(max_digits=14, decimal_places=2)),
+    ).order_by(f'-{order_by}', 'shopkeeper__username')
+    return rows[:limit] if limit else rows
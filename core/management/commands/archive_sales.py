@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from core.archive import archive_sales
+
+
+class Command(BaseCommand):
+    help = "Move settled sales older than N months from the sales table into the archive."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months', type=int, default=12, help="Keep this many whole months of sales hot (default 12).")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if options['months'] < 1:
+            self.stderr.write("--months must be at least 1 so the current month stays in the sales table.")
+            return
+        moved = archive_sales(options['months'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Archived {moved} sales."))
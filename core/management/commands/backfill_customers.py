@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core.customers import backfill
+
+
+class Command(BaseCommand):
+    help = "Create customers from the names and contacts on existing sales, link the sales to them and total them up."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        customers, linked = backfill(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Linked {linked} sales to {customers} customers."))
@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import backups
+
+
+class Command(BaseCommand):
+    help = "Back up the database while the app keeps running (SQLite online backup, or pg_dump on PostgreSQL)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', default=settings.BACKUP_DIR, help="Backup directory (default BACKUP_DIR).")
+        parser.add_argument('--incremental', action='store_true', help="SQLite: store only the pages changed since the previous backup.")
+        parser.add_argument('--pages', type=int, default=256, help="SQLite: pages copied per step (default 256).")
+        parser.add_argument('--sleep', type=float, default=0.05, help="SQLite: seconds writers get between steps (default 0.05).")
+        parser.add_argument('--max-restarts', type=int, default=20, help="SQLite: restarts caused by writes before copying the rest in one step (default 20).")
+        parser.add_argument('--jobs', type=int, default=4, help="PostgreSQL: parallel pg_dump jobs (default 4).")
+
+    def handle(self, *args, **options):
+        if not backups.is_sqlite():
+            manifest = backups.backup_postgres(options['dir'], jobs=options['jobs'])
+            self.stdout.write(self.style.SUCCESS(f"Wrote pg_dump backup {manifest['name']}."))
+            return
+
+        def progress(status, remaining, total):
+            self.stdout.write(f"  {total - remaining}/{total} pages", ending='\r')
+
+        manifest = backups.backup_sqlite(
+            options['dir'],
+            incremental=options['incremental'],
+            pages=options['pages'],
+            sleep=options['sleep'],
+            max_restarts=options['max_restarts'],
+            progress=progress if options['verbosity'] > 1 else None,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {manifest['kind']} backup {manifest['name']} "
+            f"({manifest['pages_written']} of {len(manifest['pages'])} pages)."
+        ))
@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.snapshots import export_sales
+
+
+class Command(BaseCommand):
+    help = "Append sales exported since the last run to the columnar analytics snapshot."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default=settings.SALES_SNAPSHOT_DIR, help="Snapshot directory (default SALES_SNAPSHOT_DIR).")
+        parser.add_argument('--batch-size', type=int, default=50000)
+
+    def handle(self, *args, **options):
+        exported = export_sales(options['path'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Exported {exported} sales to {options['path']}."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core.leaderboard import rebuild
+
+
+class Command(BaseCommand):
+    help = "Rebuild the shopkeeper daily sales table behind the leaderboard from hot and archived sales."
+
+    def handle(self, *args, **options):
+        rows = rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} shopkeeper daily sales rows."))
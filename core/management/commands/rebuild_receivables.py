@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core.receivables import rebuild_balances
+
+
+class Command(BaseCommand):
+    help = "Rebuild the customer balance table from the amount_left on every sale."
+
+    def handle(self, *args, **options):
+        rows = rebuild_balances()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} customer balance rows."))
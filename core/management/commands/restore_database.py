@@ -0,0 +1,54 @@
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import backups
+
+
+class Command(BaseCommand):
+    help = "Verify a backup and restore it over the database. Without a name, lists the backups."
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', nargs='?', help="Backup to restore, or 'latest'.")
+        parser.add_argument('--dir', default=settings.BACKUP_DIR, help="Backup directory (default BACKUP_DIR).")
+        parser.add_argument('--target', help="SQLite: restore into this file instead of the live database.")
+        parser.add_argument('--verify-only', action='store_true', help="SQLite: rebuild and check the backup without restoring it.")
+        parser.add_argument('--jobs', type=int, default=4, help="PostgreSQL: parallel pg_restore jobs (default 4).")
+        parser.add_argument('--noinput', '--no-input', action='store_false', dest='interactive')
+
+    def handle(self, *args, **options):
+        available = backups.list_backups(options['dir'])
+        if not options['name']:
+            for manifest in available:
+                self.stdout.write(f"{manifest['name']}  {manifest['kind']}  {manifest['created_at']}")
+            return
+
+        name = options['name']
+        if name == 'latest':
+            if not available:
+                raise CommandError(f"No backups in {options['dir']}.")
+            name = available[-1]['name']
+
+        try:
+            if options['verify_only']:
+                if backups.read_manifest(options['dir'], name)['kind'] == backups.POSTGRES:
+                    raise CommandError(f"--verify-only checks SQLite backups; {name} is a pg_dump backup. Use pg_restore --list to check it.")
+                with tempfile.TemporaryDirectory() as scratch:
+                    backups.rebuild_sqlite(options['dir'], name, f'{scratch}/verify.sqlite3')
+                self.stdout.write(self.style.SUCCESS(f"Backup {name} is complete and passes the integrity check."))
+                return
+
+            if options['interactive'] and not options['target']:
+                answer = input(f"This replaces every row in the database with backup {name}. Type 'yes' to continue: ")
+                if answer != 'yes':
+                    self.stdout.write("Restore cancelled.")
+                    return
+
+            if backups.is_sqlite():
+                backups.restore_sqlite(options['dir'], name, target_path=options['target'])
+            else:
+                backups.restore_postgres(options['dir'], name, jobs=options['jobs'])
+        except backups.BackupError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(f"Restored backup {name}."))
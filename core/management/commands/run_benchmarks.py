@@ -0,0 +1,52 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import benchmarks
+
+
+class Command(BaseCommand):
+    help = "Run the local benchmark suites and compare them with the saved baseline."
+
+    def add_arguments(self, parser):
+        parser.add_argument('suites', nargs='*', help="Suites to run (default: all). Available: " + ', '.join(sorted(benchmarks.SUITES)))
+        parser.add_argument('--repeat', type=int, default=20, help="Timed runs per case.")
+        parser.add_argument('--concurrency', type=int, default=1, help="Also load test routes from this many threads.")
+        parser.add_argument('--output', default=Path(settings.BENCHMARK_DIR) / 'latest.json')
+        parser.add_argument('--baseline', default=Path(settings.BENCHMARK_DIR) / 'baseline.json')
+        parser.add_argument('--save-baseline', action='store_true', help="Store these results as the new baseline.")
+        parser.add_argument('--threshold', type=float, default=0.2, help="Allowed slowdown before flagging (0.2 = 20%%).")
+        parser.add_argument('--fail-on-regression', action='store_true')
+
+    def handle(self, *args, **options):
+        names = options['suites'] or sorted(benchmarks.SUITES)
+        unknown = set(names) - set(benchmarks.SUITES)
+        if unknown:
+            raise CommandError(f"Unknown suite(s): {', '.join(sorted(unknown))}")
+
+        results = {}
+        for name in names:
+            self.stdout.write(f"Running {name}...")
+            results[name] = benchmarks.SUITES[name](repeat=options['repeat'], concurrency=options['concurrency'])
+            for case, metrics in results[name].items():
+                shown = ', '.join(f'{k}={v}' for k, v in metrics.items() if k != 'url')
+                self.stdout.write(f"  {case}: {shown}")
+
+        benchmarks.save_json(Path(options['output']), results)
+        baseline_path = Path(options['baseline'])
+        if options['save_baseline']:
+            baseline = benchmarks.load_json(baseline_path)
+            baseline.update(results)
+            benchmarks.save_json(baseline_path, baseline)
+            self.stdout.write(self.style.SUCCESS(f"Saved baseline to {baseline_path}."))
+            return
+
+        regressions = benchmarks.compare(results, benchmarks.load_json(baseline_path), options['threshold'])
+        if not regressions:
+            self.stdout.write(self.style.SUCCESS("No regressions against the baseline."))
+            return
+        for regression in regressions:
+            self.stdout.write(self.style.WARNING(f"REGRESSION {regression}"))
+        if options['fail_on_regression']:
+            raise CommandError(f"{len(regressions)} benchmark regression(s).")
@@ -0,0 +1,139 @@
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import Group
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from core import customers, leaderboard
+from core.models import Branch, Product, Sale, ShopkeeperPermission, User
+from core.pricing import record_initial_prices
+from core.receivables import rebuild_balances
+
+BENCH_PREFIX = 'bench'
+BENCH_PASSWORD = 'bench-password'
+
+PRODUCT_WORDS = ['Oud', 'Musk', 'Amber', 'Rose', 'Cedar', 'Vanilla', 'Citrus', 'Denim', 'Linen', 'Silk', 'Leather', 'Cotton']
+PRODUCT_KINDS = ['Eau de Parfum', 'Body Mist', 'Perfume Oil', 'Shirt', 'Dress', 'Jeans', 'Sneakers', 'Cap']
+CUSTOMER_NAMES = ['Ama', 'Kofi', 'Esi', 'Kwame', 'Akosua', 'Yaw', 'Abena', 'Kojo', 'Efua', 'Kwesi']
+
+
+class Command(BaseCommand):
+    help = "Generate branches, products, shopkeepers and sales for local benchmarking. Do not run against production."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--branches', type=int, default=5)
+        parser.add_argument('--products', type=int, default=2000, help="Products per branch.")
+        parser.add_argument('--shopkeepers', type=int, default=20)
+        parser.add_argument('--sales', type=int, default=1000000)
+        parser.add_argument('--days', type=int, default=730, help="Spread sales over this many days up to now.")
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        self.start = timezone.now() - timedelta(days=options['days'])
+        owner = self._owner()
+        branches = self._branches(options['branches'])
+        products = self._products(rng, branches, options['products'])
+        shopkeepers = self._shopkeepers(options['shopkeepers']) or [owner]
+        self._sales(rng, products, shopkeepers, options['sales'], options['days'], options['batch_size'])
+        # Sales were bulk-created, so the summaries the signals keep are rebuilt here
+        rebuild_balances()
+        leaderboard.rebuild()
+        customers.backfill()
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {len(branches)} branches, {len(products)} products, {len(shopkeepers)} shopkeepers "
+            f"and {options['sales']} sales. Log in as {owner.username} / {BENCH_PASSWORD}."
+        ))
+
+    def _owner(self):
+        owner, created = User.objects.get_or_create(
+            username=f'{BENCH_PREFIX}_owner',
+            defaults={'email': f'{BENCH_PREFIX}_owner@example.com', 'is_staff': True, 'is_superuser': True, 'is_owner': True},
+        )
+        if created:
+            owner.set_password(BENCH_PASSWORD)
+            owner.save()
+            owner.groups.add(Group.objects.get_or_create(name='Owner')[0])
+        return owner
+
+    def _branches(self, count):
+        return [
+            Branch.objects.get_or_create(name=f'{BENCH_PREFIX} branch {i}', defaults={'location': f'Bench location {i}'})[0]
+            for i in range(count)
+        ]
+
+    def _products(self, rng, branches, per_branch):
+        products = []
+        for branch in branches:
+            existing = list(Product.objects.filter(branch=branch, sku__startswith=f'{BENCH_PREFIX}-'))
+            if len(existing) >= per_branch:
+                products.extend(existing[:per_branch])
+                continue
+            new = []
+            for i in range(len(existing), per_branch):
+                cost = Decimal(rng.randint(500, 50000)) / 100
+                new.append(Product(
+                    name=f'{rng.choice(PRODUCT_WORDS)} {rng.choice(PRODUCT_KINDS)} {i}'[:50],
+                    sku=f'{BENCH_PREFIX}-{branch.id}-{i:06d}',
+                    stock=rng.randint(0, 500),
+                    cost_price=cost,
+                    selling_price=(cost * Decimal(rng.uniform(1.1, 2.0))).quantize(Decimal('0.01')),
+                    low_stock_threshold=rng.randint(2, 20),
+                    branch=branch,
+                ))
+            # Dated before the earliest seeded sale, which the signal would not know to do
+            record_initial_prices(Product.objects.bulk_create(new, batch_size=1000), effective_from=self.start)
+            products.extend(existing + list(Product.objects.filter(branch=branch, sku__in=[p.sku for p in new])))
+        return products
+
+    def _shopkeepers(self, count):
+        group = Group.objects.get_or_create(name='Shopkeeper')[0]
+        shopkeepers = []
+        for i in range(count):
+            user, created = User.objects.get_or_create(
+                username=f'{BENCH_PREFIX}_shopkeeper_{i}',
+                defaults={'email': f'{BENCH_PREFIX}_shopkeeper_{i}@example.com', 'is_shopkeeper': True},
+            )
+            if created:
+                user.set_password(BENCH_PASSWORD)
+                user.save()
+                user.groups.add(group)
+                ShopkeeperPermission.objects.create(shopkeeper=user)
+            shopkeepers.append(user)
+        return shopkeepers
+
+    def _sales(self, rng, products, shopkeepers, count, days, batch_size):
+        now = timezone.now()
+        span = days * 24 * 3600
+        modes = [mode for mode, _label in Sale.MODES_OF_PAYMENT]
+        created = 0
+        while created < count:
+            batch = []
+            for _ in range(min(batch_size, count - created)):
+                product = rng.choice(products)
+                quantity = rng.choices([1, 2, 3, 5], weights=[70, 20, 7, 3])[0]
+                total = product.selling_price * quantity
+                on_credit = rng.random() < 0.1
+                paid = (total * Decimal(rng.uniform(0.2, 0.9))).quantize(Decimal('0.01')) if on_credit else total
+                customer = rng.choice(CUSTOMER_NAMES) if on_credit or rng.random() < 0.3 else None
+                batch.append(Sale(
+                    customer_name=customer,
+                    customer_contact_details=f'024{rng.randint(0, 9999999):07d}' if customer else None,
+                    product=product,
+                    quantity_sold=quantity,
+                    amount_paid=paid,
+                    amount_left=total - paid,
+                    mode=rng.choice(modes),
+                    shopkeeper=rng.choice(shopkeepers),
+                    branch_id=product.branch_id,
+                    timestamp=now - timedelta(seconds=rng.randint(0, span)),
+                ))
+            with transaction.atomic():
+                Sale.objects.bulk_create(batch, batch_size=batch_size)
+            created += len(batch)
+            self.stdout.write(f"  {created}/{count} sales", ending='\r')
+        self.stdout.write('')
@@ -0,0 +1,51 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.models import Sale
+from core.yearend import year_end_report
+
+
+class Command(BaseCommand):
+    help = "Revenue, profit, top products and payment mode mix for a whole year across every branch."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--year', type=int, default=timezone.localdate().year - 1, help="Calendar year (default last year).")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Worker processes (default one per CPU, 1 runs in-process).")
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError("--workers must be at least 1.")
+        start = time.perf_counter()
+        report = year_end_report(options['year'], workers=options['workers'])
+        elapsed = time.perf_counter() - start
+
+        totals = report['totals']
+        self.stdout.write(f"Year-end report {report['year']}")
+        self.stdout.write(
+            f"  {totals['sales_count']} sales, {totals['quantity']} units, revenue {totals['revenue']:,.2f}, "
+            f"profit {totals['profit']:,.2f}, outstanding credit {totals['amount_left']:,.2f}"
+        )
+
+        self.stdout.write("\nBy branch")
+        for branch_id, branch in sorted(report['branches'].items()):
+            self.stdout.write(f"  {report['branch_names'].get(branch_id, branch_id):<30} revenue {branch['revenue']:>14,.2f}  profit {branch['profit']:>14,.2f}")
+
+        self.stdout.write("\nBy month")
+        for month, month_totals in sorted(report['months'].items()):
+            self.stdout.write(f"  {month:%Y-%m}  revenue {month_totals['revenue']:>14,.2f}  profit {month_totals['profit']:>14,.2f}")
+
+        self.stdout.write("\nTop products")
+        for product_id, product in report['top_products']:
+            name = report['product_names'].get(product_id, 'Deleted product')
+            self.stdout.write(f"  {name:<50} {product['quantity']:>8} units  revenue {product['revenue']:>14,.2f}")
+
+        self.stdout.write("\nPayment modes")
+        labels = dict(Sale.MODES_OF_PAYMENT)
+        for mode, mode_totals in sorted(report['modes'].items()):
+            share = mode_totals['revenue'] / totals['revenue'] * 100 if totals['revenue'] else 0
+            self.stdout.write(f"  {labels.get(mode, mode):<20} {mode_totals['sales_count']:>8} sales  revenue {mode_totals['revenue']:>14,.2f} ({share:.1f}%)")
+
+        self.stdout.write(self.style.SUCCESS(f"\nComputed {len(report['branches'])} branches x 12 months with {options['workers']} worker(s) in {elapsed:.2f}s."))
@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+
+from . import replicas
+
+
+class HTMLGZipMiddleware(GZipMiddleware):
+    """Gzip rendered HTML pages, including streaming responses.
+
+    Static files are left alone: WhiteNoise serves them from the gzip/brotli
+    copies made by collectstatic. Django's GZipMiddleware already pads the
+    gzip header randomly to blunt BREACH-style attacks on CSRF tokens.
+    """
+
+    def process_response(self, request, response):
+        if not response.get('Content-Type', '').startswith('text/html'):
+            return response
+        return super().process_response(request, response)
+
+
+class ReplicaPinMiddleware:
+    """Keep a browser on the primary database for a while after it writes.
+
+    Any non-GET request is served entirely from the primary and sets a
+    short-lived cookie; while the cookie lasts, reporting views skip the
+    replicas so the user reads their own writes despite replication lag.
+    """
+
+    SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        writing = request.method not in self.SAFE_METHODS
+        with replicas.pinned_to_primary(writing or replicas.PIN_COOKIE in request.COOKIES):
+            response = self.get_response(request)
+        if writing and replicas.replica_aliases():
+            response.set_cookie(
+                replicas.PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS, httponly=True, samesite='Lax',
+            )
+        return response
@@ -0,0 +1,76 @@
+# Generated by Django 5.1.1 on 2026-10-19 13:18
+
+import re
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def customer_key(name, contact):
+    # A frozen copy of core.receivables.customer_key, so this migration gives
+    # the same keys however that function changes later
+    digits = re.sub(r'\D', '', contact or '')
+    code = settings.PHONE_COUNTRY_CODE
+    if code and digits.startswith('00' + code):
+        digits = digits[2:]
+    if code and digits.startswith(code) and len(digits) >= len(code) + 9:
+        digits = '0' + digits[len(code):]
+    if digits:
+        return digits[-50:]
+    return ' '.join((name or '').lower().split())[:50]
+
+
+def open_balances(apps, schema_editor):
+    # Credit already given out, one row per customer per day it was given
+    Sale = apps.get_model('core', 'Sale')
+    CustomerBalance = apps.get_model('core', 'CustomerBalance')
+    balances = {}
+    sales = Sale.objects.filter(amount_left__gt=0).values_list('customer_name', 'customer_contact_details', 'amount_left', 'timestamp')
+    for name, contact, amount_left, timestamp in sales.iterator(chunk_size=2000):
+        key = (customer_key(name, contact), timezone.localdate(timestamp))
+        balance = balances.setdefault(key, CustomerBalance(customer_key=key[0], opened_on=key[1], balance=0))
+        balance.balance += amount_left
+        balance.customer_name = name or ''
+        balance.customer_contact_details = contact or ''
+    CustomerBalance.objects.bulk_create(balances.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_alter_sale_product'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('customer_key', models.CharField(max_length=50)),
+                ('customer_name', models.CharField(blank=True, max_length=50)),
+                ('customer_contact_details', models.CharField(blank=True, max_length=50)),
+                ('opened_on', models.DateField()),
+                ('balance', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['opened_on', 'customer_key'], name='customerbalance_aging_idx')],
+                'constraints': [models.UniqueConstraint(fields=('customer_key', 'opened_on'), name='unique_customer_balance_day')],
+            },
+        ),
+        migrations.CreateModel(
+            name='Payment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('mode', models.CharField(choices=[('cash', 'Cash'), ('momo', 'Momo'), ('bank transfer', 'Bank Transfer')], max_length=20)),
+                ('timestamp', models.DateTimeField(default=django.utils.timezone.now)),
+                ('received_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('sale', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payments', to='core.sale')),
+            ],
+        ),
+        migrations.RunPython(open_balances, migrations.RunPython.noop),
+    ]
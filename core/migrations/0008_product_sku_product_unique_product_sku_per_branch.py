@@ -0,0 +1,22 @@
+# Generated by Django 5.1.1 on 2026-10-19 13:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_customerbalance_payment'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='sku',
+            field=models.CharField(blank=True, help_text='Barcode or SKU scanned at the till', max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='product',
+            constraint=models.UniqueConstraint(fields=('branch', 'sku'), name='unique_product_sku_per_branch'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.1 on 2026-10-19 13:20
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_product_sku_product_unique_product_sku_per_branch'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='sale',
+            name='timestamp',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+    ]
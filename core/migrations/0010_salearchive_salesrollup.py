@@ -0,0 +1,51 @@
+# Generated by Django 5.1.1 on 2026-10-19 13:21
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_alter_sale_timestamp'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SaleArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('customer_name', models.CharField(blank=True, max_length=50, null=True)),
+                ('customer_contact_details', models.CharField(blank=True, max_length=50, null=True)),
+                ('quantity_sold', models.PositiveIntegerField()),
+                ('amount_paid', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('amount_left', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('mode', models.CharField(choices=[('cash', 'Cash'), ('momo', 'Momo'), ('bank transfer', 'Bank Transfer')], max_length=20)),
+                ('timestamp', models.DateTimeField(db_index=True)),
+                ('cost_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('selling_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.branch')),
+                ('product', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.product')),
+                ('shopkeeper', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('sales_count', models.PositiveIntegerField(default=0)),
+                ('quantity', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('amount_left', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('cost', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('list_value', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.branch')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('month', 'branch'), name='unique_sales_rollup_month_branch')],
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.1.1 on 2026-10-19 13:42
+
+from datetime import datetime, timezone
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def seed_current_prices(apps, schema_editor):
+    # Nothing is known about earlier prices, so today's apply to every past sale
+    Product = apps.get_model('core', 'Product')
+    PriceHistory = apps.get_model('core', 'PriceHistory')
+    beginning = datetime(1970, 1, 1, tzinfo=timezone.utc)
+    batch = []
+    for product_id, cost_price, selling_price in Product.objects.values_list('id', 'cost_price', 'selling_price').iterator(chunk_size=2000):
+        batch.append(PriceHistory(product_id=product_id, cost_price=cost_price, selling_price=selling_price, effective_from=beginning))
+        if len(batch) >= 2000:
+            PriceHistory.objects.bulk_create(batch)
+            batch = []
+    PriceHistory.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_stocktransfer_stocktransferline_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cost_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('selling_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('effective_from', models.DateTimeField(default=django.utils.timezone.now)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_history', to='core.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', 'effective_from'], name='pricehistory_product_from_idx')],
+            },
+        ),
+        migrations.RunPython(seed_current_prices, migrations.RunPython.noop),
+    ]
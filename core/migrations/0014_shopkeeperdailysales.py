@@ -0,0 +1,51 @@
+# Generated by Django 5.1.1 on 2026-10-19 13:44
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def summarise_sales(apps, schema_editor):
+    # One row per shopkeeper per day from the hot and archived sales, as leaderboard.rebuild() does
+    ShopkeeperDailySales = apps.get_model('core', 'ShopkeeperDailySales')
+    totals = {}
+    for model in (apps.get_model('core', 'SaleArchive'), apps.get_model('core', 'Sale')):
+        rows = model.objects.filter(shopkeeper__isnull=False).annotate(day=TruncDate('timestamp')).values('shopkeeper_id', 'day').annotate(
+            sales_count=Count('id'), units=Sum('quantity_sold'), revenue=Sum('amount_paid'),
+        ).order_by()
+        for row in rows.iterator(chunk_size=2000):
+            current = totals.setdefault((row['shopkeeper_id'], row['day']), {'sales_count': 0, 'units': 0, 'revenue': 0})
+            for field in current:
+                current[field] += row[field]
+    ShopkeeperDailySales.objects.bulk_create(
+        [ShopkeeperDailySales(shopkeeper_id=shopkeeper_id, day=day, **values) for (shopkeeper_id, day), values in totals.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_pricehistory'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShopkeeperDailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('sales_count', models.IntegerField(default=0)),
+                ('units', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('shopkeeper', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day', 'shopkeeper'], name='shopkeeperdaily_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('shopkeeper', 'day'), name='unique_shopkeeper_daily_sales')],
+            },
+        ),
+        migrations.RunPython(summarise_sales, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,97 @@
+# Generated by Django 5.1.1 on 2026-10-19 13:53
+
+import re
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def customer_key(name, contact):
+    # A frozen copy of core.receivables.customer_key, as in 0007
+    digits = re.sub(r'\D', '', contact or '')
+    code = settings.PHONE_COUNTRY_CODE
+    if code and digits.startswith('00' + code):
+        digits = digits[2:]
+    if code and digits.startswith(code) and len(digits) >= len(code) + 9:
+        digits = '0' + digits[len(code):]
+    if digits:
+        return digits[-50:]
+    return ' '.join((name or '').lower().split())[:50]
+
+
+def link_customers(apps, schema_editor):
+    # One customer per key on existing sales, labelled with the latest name and
+    # contact given, then every sale linked and counted, as customers.backfill() does
+    Customer = apps.get_model('core', 'Customer')
+    sale_models = [apps.get_model('core', 'SaleArchive'), apps.get_model('core', 'Sale')]
+    customers = {}
+    for model in sale_models:
+        rows = model.objects.order_by('timestamp', 'id').values_list(
+            'customer_name', 'customer_contact_details', 'quantity_sold', 'amount_paid',
+        )
+        for name, contact, quantity, paid in rows.iterator(chunk_size=2000):
+            key = customer_key(name, contact)
+            if not key:
+                continue
+            customer = customers.setdefault(key, Customer(key=key, sales_count=0, units=0, total_paid=0))
+            customer.name = name or customer.name
+            customer.contact = contact or customer.contact
+            customer.sales_count += 1
+            customer.units += quantity
+            customer.total_paid += paid
+    Customer.objects.bulk_create(customers.values(), batch_size=1000)
+
+    ids = dict(Customer.objects.values_list('key', 'id'))
+    for model in sale_models:
+        batch = []
+        for sale_id, name, contact in model.objects.values_list('id', 'customer_name', 'customer_contact_details').iterator(chunk_size=2000):
+            key = customer_key(name, contact)
+            if key:
+                batch.append(model(id=sale_id, customer_id=ids[key]))
+            if len(batch) >= 2000:
+                model.objects.bulk_update(batch, ['customer'])
+                batch = []
+        model.objects.bulk_update(batch, ['customer'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_shopkeeperdailysales'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Customer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=50, unique=True)),
+                ('name', models.CharField(blank=True, max_length=50)),
+                ('contact', models.CharField(blank=True, max_length=50)),
+                ('sales_count', models.IntegerField(default=0)),
+                ('units', models.IntegerField(default=0)),
+                ('total_paid', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='sale',
+            name='customer',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sales', to='core.customer'),
+        ),
+        migrations.AddField(
+            model_name='salearchive',
+            name='customer',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.customer'),
+        ),
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['customer', 'timestamp'], name='sale_customer_history_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='salearchive',
+            index=models.Index(fields=['customer', 'timestamp'], name='salearchive_customer_idx'),
+        ),
+        migrations.RunPython(link_customers, migrations.RunPython.noop),
+    ]
@@ -36,6 +36,7 @@ class Branch(models.Model):
 
 class Product(models.Model):
     name = models.CharField(max_length=50)
+    sku = models.CharField(max_length=64, null=True, blank=True, help_text="Barcode or SKU scanned at the till")
     stock = models.PositiveIntegerField(default=0)
     cost_price = models.DecimalField(max_digits=10, decimal_places=2)
     selling_price = models.DecimalField(max_digits=10, decimal_places=2)
@@ -43,10 +44,38 @@ class Product(models.Model):
     branch = models.ForeignKey(Branch, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['branch', 'sku'], name='unique_product_sku_per_branch'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        # Keep the prices as loaded so the price history signal can tell whether a save changed them
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
     def __str__(self):
         return f"{self.name} - {self.stock}"
 
 
+class Customer(models.Model):
+    # One row per customer, identified by receivables.customer_key (the digits of
+    # their contact, else their normalized name). The lifetime totals are
+    # maintained incrementally from Sale saves/deletes and payments (see core.signals).
+    key = models.CharField(max_length=50, unique=True)
+    name = models.CharField(max_length=50, blank=True)
+    contact = models.CharField(max_length=50, blank=True)
+    sales_count = models.IntegerField(default=0)
+    units = models.IntegerField(default=0)
+    total_paid = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name or self.contact or self.key
+
+
 class Sale(models.Model):
     MODES_OF_PAYMENT = [
         ('cash', 'Cash'),
@@ -63,8 +92,15 @@ class Sale(models.Model):
     mode = models.CharField(max_length=20, choices=MODES_OF_PAYMENT)
     shopkeeper = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
     branch = models.ForeignKey(Branch, on_delete=models.CASCADE)
-    timestamp = models.DateTimeField(default=timezone.now)
-    
+    timestamp = models.DateTimeField(default=timezone.now, db_index=True)
+    # Set from customer_name/customer_contact_details when the sale is saved
+    customer = models.ForeignKey(Customer, on_delete=models.SET_NULL, null=True, blank=True, related_name='sales', db_index=False)
+
+    class Meta:
+        indexes = [
+            # Also serves lookups by customer alone
+            models.Index(fields=['customer', 'timestamp'], name='sale_customer_history_idx'),
+        ]
     
     @property
     def profit(self):
@@ -79,4 +115,227 @@ class Sale(models.Model):
 
 class ShopkeeperPermission(models.Model):
     shopkeeper = models.OneToOneField(User, on_delete=models.CASCADE)
-    can_edit_stock = models.BooleanField(default=False)
\ No newline at end of file
+    can_edit_stock = models.BooleanField(default=False)
+
+
+class CustomerBalance(models.Model):
+    # Outstanding credit per customer, bucketed by the day it was given.
+    # Maintained incrementally from Sale saves/deletes and payments (see core.signals).
+    customer_key = models.CharField(max_length=50)
+    customer_name = models.CharField(max_length=50, blank=True)
+    customer_contact_details = models.CharField(max_length=50, blank=True)
+    opened_on = models.DateField()
+    balance = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['customer_key', 'opened_on'], name='unique_customer_balance_day'),
+        ]
+        indexes = [
+            models.Index(fields=['opened_on', 'customer_key'], name='customerbalance_aging_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.customer_name or self.customer_key} - {self.balance}"
+
+
+class Payment(models.Model):
+    sale = models.ForeignKey(Sale, on_delete=models.CASCADE, related_name='payments')
+    amount = models.DecimalField(decimal_places=2, max_digits=10)
+    mode = models.CharField(max_length=20, choices=Sale.MODES_OF_PAYMENT)
+    received_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    timestamp = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.amount} on sale #{self.sale_id}"
+
+
+class SaleArchive(models.Model):
+    # Sales moved out of core_sale by the archive_sales command. Keeps the
+    # original id and the product prices in force when the sale was made.
+    id = models.BigIntegerField(primary_key=True)
+    customer_name = models.CharField(max_length=50, null=True, blank=True)
+    customer_contact_details = models.CharField(max_length=50, null=True, blank=True)
+    product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    quantity_sold = models.PositiveIntegerField()
+    amount_paid = models.DecimalField(decimal_places=2, max_digits=10)
+    amount_left = models.DecimalField(decimal_places=2, max_digits=10)
+    mode = models.CharField(max_length=20, choices=Sale.MODES_OF_PAYMENT)
+    shopkeeper = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    branch = models.ForeignKey(Branch, on_delete=models.CASCADE, related_name='+')
+    timestamp = models.DateTimeField(db_index=True)
+    cost_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    selling_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    customer = models.ForeignKey(Customer, on_delete=models.SET_NULL, null=True, blank=True, related_name='+', db_index=False)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['customer', 'timestamp'], name='salearchive_customer_idx'),
+        ]
+
+    def __str__(self):
+        return f"Archived sale #{self.id}"
+
+
+class SalesRollup(models.Model):
+    # Monthly per-branch totals of archived sales, so reports don't need to scan the archive.
+    month = models.DateField()
+    branch = models.ForeignKey(Branch, on_delete=models.CASCADE)
+    sales_count = models.PositiveIntegerField(default=0)
+    quantity = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    amount_left = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    cost = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    list_value = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['month', 'branch'], name='unique_sales_rollup_month_branch'),
+        ]
+
+    def __str__(self):
+        return f"{self.branch} {self.month:%Y-%m}"
+
+
+class Stocktake(models.Model):
+    # A physical count of one branch. Counts are collected while it is open
+    # and applied to Product.stock in one go when it is committed.
+    OPEN = 'open'
+    COMMITTED = 'committed'
+    CANCELLED = 'cancelled'
+    STATUSES = [
+        (OPEN, 'Open'),
+        (COMMITTED, 'Committed'),
+        (CANCELLED, 'Cancelled'),
+    ]
+
+    branch = models.ForeignKey(Branch, on_delete=models.CASCADE)
+    status = models.CharField(max_length=20, choices=STATUSES, default=OPEN)
+    started_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    started_at = models.DateTimeField(default=timezone.now)
+    committed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Stocktake #{self.id} - {self.branch}"
+
+
+class StocktakeCount(models.Model):
+    stocktake = models.ForeignKey(Stocktake, on_delete=models.CASCADE, related_name='counts')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    counted = models.PositiveIntegerField(default=0)
+    # System stock when the product was counted; sales made after that are
+    # kept when the stocktake is committed
+    expected = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['stocktake', 'product'], name='unique_stocktake_count_product'),
+        ]
+
+
+class StockAdjustment(models.Model):
+    # Audit trail for stock changes made outside of sales
+    STOCKTAKE = 'stocktake'
+    REASONS = [
+        (STOCKTAKE, 'Stocktake'),
+    ]
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='adjustments')
+    reason = models.CharField(max_length=20, choices=REASONS)
+    previous_stock = models.PositiveIntegerField()
+    new_stock = models.PositiveIntegerField()
+    stocktake = models.ForeignKey(Stocktake, on_delete=models.SET_NULL, null=True, blank=True, related_name='adjustments')
+    adjusted_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    timestamp = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['product', 'timestamp'], name='stockadjustment_product_idx'),
+        ]
+
+    @property
+    def difference(self):
+        return self.new_stock - self.previous_stock
+
+    def __str__(self):
+        return f"{self.product} {self.previous_stock} -> {self.new_stock}"
+
+
+class StockTransfer(models.Model):
+    # Stock leaves the source branch when the transfer is dispatched and
+    # reaches the destination when it is received; in between it is in transit.
+    IN_TRANSIT = 'in_transit'
+    RECEIVED = 'received'
+    CANCELLED = 'cancelled'
+    STATUSES = [
+        (IN_TRANSIT, 'In transit'),
+        (RECEIVED, 'Received'),
+        (CANCELLED, 'Cancelled'),
+    ]
+
+    source = models.ForeignKey(Branch, on_delete=models.CASCADE, related_name='transfers_out')
+    destination = models.ForeignKey(Branch, on_delete=models.CASCADE, related_name='transfers_in')
+    status = models.CharField(max_length=20, choices=STATUSES, default=IN_TRANSIT)
+    dispatched_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    dispatched_at = models.DateTimeField(default=timezone.now)
+    received_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    received_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'destination'], name='stocktransfer_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"Transfer #{self.id} {self.source} -> {self.destination}"
+
+
+class StockTransferLine(models.Model):
+    transfer = models.ForeignKey(StockTransfer, on_delete=models.CASCADE, related_name='lines')
+    source_product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    destination_product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    quantity = models.PositiveIntegerField()
+
+    def __str__(self):
+        return f"{self.quantity} x {self.source_product}"
+
+
+class PriceHistory(models.Model):
+    # The prices a product had from effective_from until the next row's effective_from.
+    # Written by core.signals on every price change and by bulk repricing.
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='price_history')
+    cost_price = models.DecimalField(max_digits=10, decimal_places=2)
+    selling_price = models.DecimalField(max_digits=10, decimal_places=2)
+    effective_from = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['product', 'effective_from'], name='pricehistory_product_from_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} {self.selling_price} from {self.effective_from:%Y-%m-%d %H:%M}"
+
+
+class ShopkeeperDailySales(models.Model):
+    # Per-shopkeeper, per-day sales totals behind the leaderboard. Maintained
+    # incrementally from Sale saves/deletes and payments (see core.leaderboard).
+    shopkeeper = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    day = models.DateField()
+    sales_count = models.IntegerField(default=0)
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['shopkeeper', 'day'], name='unique_shopkeeper_daily_sales'),
+        ]
+        indexes = [
+            # Ranking a period scans a day range
+            models.Index(fields=['day', 'shopkeeper'], name='shopkeeperdaily_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.shopkeeper_id} {self.day}"
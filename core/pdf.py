@@ -0,0 +1,307 @@
+"""A small in-process PDF writer for sales reports and receipts.
+
+It only knows what our documents need: the built-in Helvetica fonts, text
+and ruled lines. Pages are written out as soon as they are laid out, so a
+report of any length streams in bounded memory and nothing has to fork
+wkhtmltopdf.
+"""
+from functools import lru_cache
+
+from django.utils import timezone
+
+# Helvetica advance widths (1/1000 em) for printable ASCII, from the standard AFM
+_HELVETICA_WIDTHS = [
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+]
+
+A4_LANDSCAPE = (842, 595)
+RECEIPT_SIZE = (227, 400)  # 80mm till roll
+
+
+class Font:
+    """A standard PDF font with the metrics needed to measure and truncate text."""
+
+    def __init__(self, key, base_font, width_scale=1.0):
+        self.key = key
+        self.base_font = base_font
+        self._widths = {chr(32 + i): w * width_scale for i, w in enumerate(_HELVETICA_WIDTHS)}
+        self._default_width = 556 * width_scale
+
+    def width(self, text, size):
+        return self._units(text) * size / 1000
+
+    @lru_cache(maxsize=8192)
+    def _units(self, text):
+        # Names, modes and branches repeat on every page, so measure each string once
+        widths = self._widths
+        default = self._default_width
+        return sum([widths.get(char, default) for char in text])
+
+    def fit(self, text, width, size):
+        """Return ``text`` cut down with an ellipsis so it fits in ``width`` points."""
+        if self.width(text, size) <= width:
+            return text
+        while text and self.width(text + '...', size) > width:
+            text = text[:-1]
+        return text + '...'
+
+
+# Shared by every document; bold text runs a little wider than regular
+REGULAR = Font('F1', 'Helvetica')
+BOLD = Font('F2', 'Helvetica-Bold', width_scale=1.06)
+FONTS = (REGULAR, BOLD)
+
+
+def _escape(text):
+    encoded = str(text).encode('cp1252', errors='replace')
+    return encoded.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+
+
+class Page:
+    """Drawing operations for one page, kept as a list of content stream lines."""
+
+    def __init__(self, size):
+        self.width, self.height = size
+        self._ops = []
+
+    def text(self, x, y, text, font=REGULAR, size=9, align='left', width=None):
+        """Draw ``text`` with its baseline at ``y`` (measured from the top of the page)."""
+        if width is not None:
+            text = font.fit(text, width, size)
+        if align == 'right':
+            x += (width or 0) - font.width(text, size)
+        elif align == 'center':
+            x += ((width or 0) - font.width(text, size)) / 2
+        self._ops.append(
+            b'BT /%s %g Tf %.2f %.2f Td (%s) Tj ET' % (font.key.encode(), size, x, self.height - y, _escape(text))
+        )
+
+    def line(self, x1, y1, x2, y2, width=0.5):
+        self._ops.append(b'%g w %.2f %.2f m %.2f %.2f l S' % (width, x1, self.height - y1, x2, self.height - y2))
+
+    def content(self):
+        return b'\n'.join(self._ops)
+
+
+class PDFWriter:
+    """Writes a PDF incrementally: each page is emitted as soon as it is added.
+
+    Object 1 is the catalog and 2 the page tree; both, along with the fonts,
+    are written by ``close()`` once all page ids are known.
+    """
+
+    def __init__(self, title=''):
+        self.title = title
+        self._offset = 0
+        self._offsets = {}
+        self._next_id = 3 + len(FONTS)
+        self._page_ids = []
+
+    def _emit(self, data):
+        self._offset += len(data)
+        return data
+
+    def _object(self, object_id, body):
+        self._offsets[object_id] = self._offset
+        return self._emit(b'%d 0 obj\n%s\nendobj\n' % (object_id, body))
+
+    def _font_id(self, font):
+        return 3 + FONTS.index(font)
+
+    def start(self):
+        return self._emit(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+
+    def add_page(self, page):
+        content = page.content()
+        content_id, page_id = self._next_id, self._next_id + 1
+        self._next_id += 2
+        self._page_ids.append(page_id)
+        fonts = b' '.join(b'/%s %d 0 R' % (font.key.encode(), self._font_id(font)) for font in FONTS)
+        return self._object(
+            content_id, b'<< /Length %d >>\nstream\n%s\nendstream' % (len(content), content)
+        ) + self._object(
+            page_id,
+            b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Contents %d 0 R /Resources << /Font << %s >> >> >>'
+            % (page.width, page.height, content_id, fonts),
+        )
+
+    def close(self):
+        out = self._object(1, b'<< /Type /Catalog /Pages 2 0 R >>')
+        kids = b' '.join(b'%d 0 R' % page_id for page_id in self._page_ids)
+        out += self._object(2, b'<< /Type /Pages /Kids [%s] /Count %d >>' % (kids, len(self._page_ids)))
+        for font in FONTS:
+            out += self._object(
+                self._font_id(font),
+                b'<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding >>' % font.base_font.encode(),
+            )
+        info_id = self._next_id
+        out += self._object(info_id, b'<< /Title (%s) /Producer (Fits and Fragrances) >>' % _escape(self.title))
+
+        xref_offset = self._offset
+        size = info_id + 1
+        xref = [b'xref\n0 %d\n' % size, b'0000000000 65535 f \n']
+        for object_id in range(1, size):
+            xref.append(b'%010d 00000 n \n' % self._offsets[object_id])
+        xref.append(b'trailer\n<< /Size %d /Root 1 0 R /Info %d 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (size, info_id, xref_offset))
+        return out + b''.join(xref)
+
+
+class Column:
+    def __init__(self, title, width, align='left'):
+        self.title = title
+        self.width = width
+        self.align = align
+
+
+class TableLayout:
+    """Lays rows out in a ruled table, repeating the header on every page."""
+
+    def __init__(self, title, columns, size=A4_LANDSCAPE, margin=36, font_size=8, row_height=13):
+        self.title = title
+        self.columns = columns
+        self.size = size
+        self.margin = margin
+        self.font_size = font_size
+        self.row_height = row_height
+        header_bottom = margin + 40 + row_height
+        self.rows_per_page = int((size[1] - header_bottom - margin - 16) // row_height)
+
+    def _start_page(self, number, subtitle):
+        page = Page(self.size)
+        left = self.margin
+        page.text(left, self.margin + 12, self.title, font=BOLD, size=14)
+        page.text(left, self.margin + 28, subtitle, size=8)
+        page.text(left, self.margin + 28, f'Page {number}', size=8, align='right', width=page.width - 2 * self.margin)
+
+        y = self.margin + 40
+        x = left
+        for column in self.columns:
+            page.text(x + 2, y + self.row_height - 4, column.title, font=BOLD, size=self.font_size, align=column.align, width=column.width - 4)
+            x += column.width
+        page.line(left, y + self.row_height, x, y + self.row_height, width=1)
+        return page, y + self.row_height
+
+    def render(self, rows, subtitle=''):
+        """Yield the PDF as byte chunks, one page at a time."""
+        writer = PDFWriter(self.title)
+        yield writer.start()
+
+        number = 1
+        page, y = self._start_page(number, subtitle)
+        on_page = 0
+        for row in rows:
+            if on_page == self.rows_per_page:
+                yield writer.add_page(page)
+                number += 1
+                page, y = self._start_page(number, subtitle)
+                on_page = 0
+            x = self.margin
+            for column, value in zip(self.columns, row):
+                page.text(x + 2, y + self.row_height - 4, '' if value is None else str(value), size=self.font_size, align=column.align, width=column.width - 4)
+                x += column.width
+            y += self.row_height
+            page.line(self.margin, y, x, y, width=0.25)
+            on_page += 1
+
+        if on_page == 0 and number == 1:
+            page.text(self.margin, y + self.row_height, 'No sales in this period.', size=self.font_size)
+        yield writer.add_page(page)
+        yield writer.close()
+
+
+SALES_REPORT_COLUMNS = [
+    Column('#', 40, 'right'),
+    Column('Date', 80),
+    Column('Item', 170),
+    Column('Qty', 35, 'right'),
+    Column('Paid', 70, 'right'),
+    Column('Left', 60, 'right'),
+    Column('Mode', 70),
+    Column('Customer', 100),
+    Column('Sold By', 80),
+    Column('Branch', 65),
+]
+
+
+def _local(timestamp):
+    return timezone.localtime(timestamp) if timezone.is_aware(timestamp) else timestamp
+
+
+def sales_report(rows, subtitle=''):
+    """Stream a sales report PDF.
+
+    ``rows`` yields (id, timestamp, product name, quantity, amount paid,
+    amount left, mode, customer name, shopkeeper username, branch name).
+    """
+    def cells():
+        for sale_id, timestamp, product, quantity, paid, left, mode, customer, shopkeeper, branch in rows:
+            yield (
+                sale_id, _local(timestamp).strftime('%Y-%m-%d %H:%M'), product or 'Deleted product',
+                quantity, f'{paid:,.2f}', f'{left:,.2f}', mode, customer, shopkeeper, branch,
+            )
+
+    return TableLayout('Sales Report', SALES_REPORT_COLUMNS).render(cells(), subtitle=subtitle)
+
+
+def sale_receipt(sale):
+    """A one-page till receipt for ``sale`` as bytes."""
+    page = Page(RECEIPT_SIZE)
+    width = page.width - 24
+    lines = [
+        ('Fits and Fragrances', BOLD, 12, 'center'),
+        (sale.branch.name if sale.branch_id else '', REGULAR, 8, 'center'),
+        (_local(sale.timestamp).strftime('%Y-%m-%d %H:%M'), REGULAR, 8, 'center'),
+        (f'Receipt #{sale.id}', REGULAR, 8, 'center'),
+    ]
+    y = 24
+    for text, font, size, align in lines:
+        page.text(12, y, text, font=font, size=size, align=align, width=width)
+        y += size + 6
+    page.line(12, y, 12 + width, y)
+    y += 16
+
+    product = sale.product.name if sale.product_id else 'Deleted product'
+    unit_price = sale.product.selling_price if sale.product_id else None
+    page.text(12, y, product, size=9, width=width)
+    y += 13
+    detail = f'{sale.quantity_sold} x {unit_price:,.2f}' if unit_price is not None else f'{sale.quantity_sold} item(s)'
+    page.text(12, y, detail, size=8, width=width)
+    y += 18
+    page.line(12, y - 10, 12 + width, y - 10)
+
+    for label, value, font in (
+        ('Paid', sale.amount_paid, BOLD),
+        ('Balance left', sale.amount_left, REGULAR),
+    ):
+        page.text(12, y, label, font=font, size=9)
+        page.text(12, y, f'{value:,.2f}', font=font, size=9, align='right', width=width)
+        y += 14
+    page.text(12, y, 'Payment', size=8)
+    page.text(12, y, sale.get_mode_display(), size=8, align='right', width=width)
+    y += 12
+    if sale.customer_name:
+        page.text(12, y, 'Customer', size=8)
+        page.text(12, y, sale.customer_name, size=8, align='right', width=width)
+        y += 12
+    if sale.shopkeeper_id:
+        page.text(12, y, 'Served by', size=8)
+        page.text(12, y, sale.shopkeeper.username, size=8, align='right', width=width)
+        y += 12
+
+    page.text(12, y + 20, 'Thank you for shopping with us!', size=8, align='center', width=width)
+
+    writer = PDFWriter(f'Receipt {sale.id}')
+    return writer.start() + writer.add_page(page) + writer.close()
+
+
+def report_subtitle(start=None, end=None):
+    generated = timezone.localtime().strftime('%Y-%m-%d %H:%M')
+    if start and end:
+        return f'{start:%Y-%m-%d} to {end:%Y-%m-%d} - generated {generated}'
+    return f'Most recent sales - generated {generated}'
+
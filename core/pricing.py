@@ -0,0 +1,62 @@
+"""Point-in-time product prices.
+
+Every price a product has had is kept in PriceHistory. ``price_at`` builds
+a correlated subquery that picks, for each row of a queryset, the history
+row in force at that row's timestamp; it is answered from the
+(product, effective_from) index, so margin reports over any number of sales
+stay a single query instead of one lookup per sale.
+"""
+from django.db.models import DecimalField, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import PriceHistory
+
+PRICE_FIELDS = ('cost_price', 'selling_price')
+
+
+def price_at(field, product='product', at='timestamp'):
+    """``field`` of ``product`` as it was at ``at``, both resolved against the outer query.
+
+    A row older than the product's history gets its earliest recorded price;
+    the current price is only used for products with no history at all.
+    """
+    history = PriceHistory.objects.filter(product=OuterRef(product))
+    historical = history.filter(effective_from__lte=OuterRef(at)).order_by('-effective_from').values(field)[:1]
+    earliest = history.order_by('effective_from').values(field)[:1]
+    output_field = DecimalField(max_digits=10, decimal_places=2)
+    return Coalesce(
+        Subquery(historical, output_field=output_field),
+        Subquery(earliest, output_field=output_field),
+        F(f'{product}__{field}'),
+    )
+
+
+def with_prices_at_sale(sales):
+    """Annotate sales with the cost_price and selling_price in force when they were made."""
+    return sales.annotate(**{field: price_at(field) for field in PRICE_FIELDS})
+
+
+def record_prices(product, effective_from=None):
+    return PriceHistory.objects.create(
+        product=product,
+        cost_price=product.cost_price,
+        selling_price=product.selling_price,
+        effective_from=effective_from or timezone.now(),
+    )
+
+
+def record_initial_prices(products, effective_from=None):
+    """Starting history rows for products made with bulk_create, which skips the save signal."""
+    effective_from = effective_from or timezone.now()
+    return PriceHistory.objects.bulk_create(
+        [
+            PriceHistory(product=product, cost_price=product.cost_price, selling_price=product.selling_price, effective_from=effective_from)
+            for product in products
+        ],
+        batch_size=1000,
+    )
+
+
+def prices_changed(old, product):
+    return old is None or any(old[field] != getattr(product, field) for field in PRICE_FIELDS)
@@ -0,0 +1,163 @@
+import re
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Max, Min, Q, Sum
+from django.utils import timezone
+
+from . import archive, customers, leaderboard
+from .models import CustomerBalance, Payment, Sale
+
+AGING_BUCKETS = [
+    ('days_0_30', '0-30 days', 0, 30),
+    ('days_31_60', '31-60 days', 31, 60),
+    ('days_61_90', '61-90 days', 61, 90),
+    ('days_over_90', '90+ days', 91, None),
+]
+
+RECEIVABLE_FIELDS = ('customer_name', 'customer_contact_details', 'amount_left', 'timestamp')
+
+
+def customer_key(name, contact):
+    """Identify a customer by the digits of their contact, falling back to their name.
+
+    Numbers written in international form (+233 24..., 00233 24...) are
+    keyed in their local form (024...), so both spellings match.
+    """
+    digits = re.sub(r'\D', '', contact or '')
+    code = settings.PHONE_COUNTRY_CODE
+    if code and digits.startswith('00' + code):
+        digits = digits[2:]
+    if code and digits.startswith(code) and len(digits) >= len(code) + 9:
+        digits = '0' + digits[len(code):]
+    if digits:
+        return digits[-50:]
+    return ' '.join((name or '').lower().split())[:50]
+
+
+def sale_values(sale):
+    """The receivable-relevant fields of a sale as they are now."""
+    return {field: getattr(sale, field) for field in RECEIVABLE_FIELDS}
+
+
+def adjust_balance(name, contact, opened_on, delta):
+    """Add delta to a customer's balance for the given day, creating the row if needed."""
+    if not delta:
+        return
+    key = customer_key(name, contact)
+    lookup = CustomerBalance.objects.filter(customer_key=key, opened_on=opened_on)
+    labels = {}
+    if name:
+        labels['customer_name'] = name
+    if contact:
+        labels['customer_contact_details'] = contact
+
+    if not lookup.update(balance=F('balance') + delta, **labels):
+        try:
+            with transaction.atomic():
+                CustomerBalance.objects.create(customer_key=key, opened_on=opened_on, balance=delta, **labels)
+        except IntegrityError:
+            # Another request created the row first
+            lookup.update(balance=F('balance') + delta, **labels)
+
+    if delta < 0:
+        lookup.filter(balance__lte=0).delete()
+
+
+def record_sale_change(old, new):
+    """Move a sale's outstanding amount from its old values to its new ones.
+
+    ``old`` and ``new`` are dicts of RECEIVABLE_FIELDS; either may be None for
+    a created or deleted sale.
+    """
+    for values, sign in ((old, -1), (new, 1)):
+        if not values or not values.get('amount_left') or values.get('timestamp') is None:
+            continue
+        adjust_balance(
+            values['customer_name'],
+            values['customer_contact_details'],
+            timezone.localdate(values['timestamp']),
+            sign * values['amount_left'],
+        )
+
+
+def record_payment(sale, amount, mode, received_by=None):
+    """Apply a partial or full payment against the credit left on a sale."""
+    amount = Decimal(amount)
+    if amount <= 0:
+        raise ValueError('Payment amount must be greater than zero.')
+
+    with transaction.atomic():
+        # Conditional update so two tills can't both collect the last of a balance
+        updated = Sale.objects.filter(pk=sale.pk, amount_left__gte=amount).update(
+            amount_left=F('amount_left') - amount,
+            amount_paid=F('amount_paid') + amount,
+        )
+        if not updated:
+            raise ValueError('Payment is more than the amount left on this sale.')
+
+        payment = Payment.objects.create(sale=sale, amount=amount, mode=mode, received_by=received_by)
+        adjust_balance(
+            sale.customer_name,
+            sale.customer_contact_details,
+            timezone.localdate(sale.timestamp),
+            -amount,
+        )
+        leaderboard.record_payment(sale, amount)
+        customers.record_payment(sale, amount)
+    return payment
+
+
+def rebuild_balances():
+    """Recompute every balance from Sale. Used for the initial backfill."""
+    with transaction.atomic():
+        archive.lock_sales()
+        totals = {}
+        labels = {}
+        sales = Sale.objects.filter(amount_left__gt=0).values_list(*RECEIVABLE_FIELDS)
+        for name, contact, amount_left, timestamp in sales.iterator(chunk_size=2000):
+            key = (customer_key(name, contact), timezone.localdate(timestamp))
+            totals[key] = totals.get(key, 0) + amount_left
+            labels[key] = (name or '', contact or '')
+
+        CustomerBalance.objects.all().delete()
+        CustomerBalance.objects.bulk_create(
+            [
+                CustomerBalance(
+                    customer_key=key,
+                    opened_on=opened_on,
+                    customer_name=labels[(key, opened_on)][0],
+                    customer_contact_details=labels[(key, opened_on)][1],
+                    balance=balance,
+                )
+                for (key, opened_on), balance in totals.items()
+            ],
+            batch_size=1000,
+        )
+    return len(totals)
+
+
+def aging_report(as_of=None):
+    """Per-customer outstanding balances split into aging buckets, plus grand totals."""
+    today = as_of or timezone.localdate()
+    bucket_sums = {}
+    for field, _label, min_days, max_days in AGING_BUCKETS:
+        condition = Q()
+        if min_days:
+            condition &= Q(opened_on__lte=today - timedelta(days=min_days))
+        if max_days is not None:
+            condition &= Q(opened_on__gte=today - timedelta(days=max_days))
+        bucket_sums[field] = Sum('balance', filter=condition, default=0)
+
+    balances = CustomerBalance.objects.filter(balance__gt=0)
+    customers = balances.values('customer_key').annotate(
+        name=Max('customer_name'),
+        contact=Max('customer_contact_details'),
+        oldest=Min('opened_on'),
+        total=Sum('balance'),
+        **bucket_sums,
+    ).order_by('-total')
+    totals = balances.aggregate(total=Sum('balance', default=0), **bucket_sums)
+    return customers, totals
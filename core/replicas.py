@@ -0,0 +1,81 @@
+"""Routing of reporting reads to read replicas.
+
+Replicas are configured with DATABASE_REPLICA_URLS and show up as
+``replica_<n>`` entries in DATABASES. Only code running inside
+``reporting()`` (or a view wrapped in ``reporting_view``) reads from them;
+everything else, and every write, stays on the primary. After a POST the
+ReplicaPinMiddleware keeps that browser on the primary for
+REPLICA_PIN_SECONDS, so a shopkeeper who has just recorded a sale sees it
+even if the replicas are lagging.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA_PREFIX = 'replica_'
+PIN_COOKIE = 'pin_primary'
+
+_reporting = ContextVar('reporting', default=False)
+_pinned = ContextVar('pinned_to_primary', default=False)
+
+
+def replica_aliases():
+    return [alias for alias in settings.DATABASES if alias.startswith(REPLICA_PREFIX)]
+
+
+def read_db():
+    """The database alias a read should use right now."""
+    if not _reporting.get() or _pinned.get():
+        return DEFAULT_DB_ALIAS
+    # Reads inside a transaction on the primary must see its uncommitted writes
+    if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+        return DEFAULT_DB_ALIAS
+    aliases = replica_aliases()
+    return random.choice(aliases) if aliases else DEFAULT_DB_ALIAS
+
+
+@contextmanager
+def reporting():
+    """Send reads made inside the block to a replica, unless pinned to the primary."""
+    token = _reporting.set(True)
+    try:
+        yield
+    finally:
+        _reporting.reset(token)
+
+
+@contextmanager
+def pinned_to_primary(pinned=True):
+    token = _pinned.set(pinned)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+
+def reporting_view(view):
+    """Run a read-only view's queries against a replica."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        with reporting():
+            return view(request, *args, **kwargs)
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return read_db()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return not db.startswith(REPLICA_PREFIX)
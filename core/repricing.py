@@ -0,0 +1,125 @@
+"""Bulk repricing of products as set-based updates.
+
+A repricing is a filter (branch, name, current margin band) plus a price
+expression built from the product's own columns. Previews are one aggregate
+query. Applying is one UPDATE and one INSERT ... SELECT into PriceHistory,
+so tens of thousands of products are repriced without loading any of them
+into Python.
+"""
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Avg, Count, DecimalField, ExpressionWrapper, F, Sum, Value
+from django.db.models.functions import Ceil, Floor, Greatest, Round
+from django.db.models.lookups import LessThan
+from django.utils import timezone
+
+from .models import PriceHistory, Product
+
+BASES = [
+    ('selling', 'Current selling price'),
+    ('cost', 'Cost price'),
+]
+MODES = [
+    ('percent', 'Percentage'),
+    ('fixed', 'Fixed amount'),
+]
+ROUNDING = [
+    ('none', 'To the cent'),
+    ('nearest', 'Nearest step'),
+    ('up', 'Up to the step'),
+    ('down', 'Down to the step'),
+    ('ninety_nine', 'Up to .99'),
+]
+
+MONEY = DecimalField(max_digits=10, decimal_places=2)
+
+
+def select_products(branch=None, name=None, min_margin=None, max_margin=None):
+    """Products matching the filters. Margins are percentages over cost price."""
+    products = Product.objects.all()
+    if branch is not None:
+        products = products.filter(branch=branch)
+    if name:
+        products = products.filter(name__icontains=name)
+    # margin >= m  <=>  selling >= cost * (1 + m/100), which needs no per-row division
+    if min_margin is not None:
+        products = products.filter(selling_price__gte=F('cost_price') * (1 + Decimal(min_margin) / 100))
+    if max_margin is not None:
+        products = products.filter(selling_price__lte=F('cost_price') * (1 + Decimal(max_margin) / 100))
+    return products
+
+
+def _money(expression):
+    return ExpressionWrapper(expression, output_field=MONEY)
+
+
+def _rounded(price, rounding, step):
+    if rounding == 'ninety_nine':
+        # x.99 stays put; anything else goes up to the next .99
+        return _money(Ceil(price + Decimal('0.01')) - Decimal('0.01'))
+    if rounding == 'none' or not step:
+        return _money(Round(price, 2))
+    functions = {'nearest': Round, 'up': Ceil, 'down': Floor}
+    return _money(functions[rounding](_money(price / step)) * step)
+
+
+def price_expression(amount, mode='percent', base='selling', rounding='none', step=Decimal('1.00'), floor_at_cost=False):
+    """The new selling price as an SQL expression over each product's columns."""
+    base_price = F('selling_price' if base == 'selling' else 'cost_price')
+    amount = Decimal(amount)
+    if mode == 'percent':
+        price = _money(base_price * (1 + amount / 100))
+    else:
+        price = _money(base_price + amount)
+    price = _rounded(price, rounding, Decimal(step))
+    floor = F('cost_price') if floor_at_cost else Value(Decimal('0.00'))
+    return _money(Greatest(price, floor))
+
+
+def preview(products, price, sample_size=20):
+    """Totals for the repricing from one aggregate query, plus a few example rows."""
+    summary = products.aggregate(
+        products=Count('id'),
+        current_average=Avg('selling_price'),
+        new_average=Avg(price),
+        current_total=Sum('selling_price'),
+        new_total=Sum(price),
+        below_cost=Count('id', filter=LessThan(price, F('cost_price'))),
+    )
+    summary = {field: value or 0 for field, value in summary.items()}
+    summary['samples'] = list(
+        products.select_related('branch').annotate(new_price=price).order_by('name', 'id')[:sample_size]
+    )
+    return summary
+
+
+def apply(products, price):
+    """Reprice ``products`` and record the new prices in PriceHistory. Returns the number changed."""
+    with transaction.atomic():
+        changed = products.exclude(selling_price=price).update(selling_price=price)
+        if changed:
+            _record_new_prices(timezone.now())
+    return changed
+
+
+def _record_new_prices(effective_from):
+    # Every other price change writes its history row as it saves, so the
+    # products whose latest row disagrees with their price are the ones just updated
+    product = connection.ops.quote_name(Product._meta.db_table)
+    history = connection.ops.quote_name(PriceHistory._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {history} (product_id, cost_price, selling_price, effective_from)
+            SELECT p.id, p.cost_price, p.selling_price, %s
+            FROM {product} p
+            WHERE COALESCE((
+                SELECT h.selling_price FROM {history} h
+                WHERE h.product_id = p.id
+                ORDER BY h.effective_from DESC, h.id DESC
+                LIMIT 1
+            ), -1) <> p.selling_price
+            """,
+            [connection.ops.adapt_datetimefield_value(effective_from)],
+        )
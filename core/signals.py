@@ -0,0 +1,102 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import archive, customers, leaderboard, pricing, receivables
+from .backends import forget_user
+from .models import Product, Sale, User
+
+
+def _loaded(instance, fields):
+    # The values the instance had in the database before this save or delete, if we know them
+    loaded = getattr(instance, '_loaded_values', None)
+    if not loaded or any(field not in loaded for field in fields):
+        return None
+    return {field: loaded[field] for field in fields}
+
+
+def _remember(instance):
+    instance._loaded_values = {field.attname: getattr(instance, field.attname) for field in instance._meta.concrete_fields}
+
+
+def _read_sale(instance):
+    # The row as stored now. The instance itself can't be trusted: it may have
+    # been loaded with deferred fields, or before a payment's UPDATE changed it.
+    instance._loaded_values = Sale.objects.filter(pk=instance.pk).values(
+        *(field.attname for field in Sale._meta.concrete_fields),
+    ).first()
+
+
+@receiver(pre_save, sender=Sale)
+def sale_customer(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    if instance.pk is None:
+        instance._loaded_values = None
+    else:
+        _read_sale(instance)
+    customers.assign_customer(instance, instance._loaded_values)
+
+
+@receiver(post_save, sender=Sale)
+def sale_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    old = None if created else _loaded(instance, receivables.RECEIVABLE_FIELDS)
+    receivables.record_sale_change(old, receivables.sale_values(instance))
+    old = None if created else _loaded(instance, leaderboard.LEADERBOARD_FIELDS)
+    leaderboard.record_sale_change(old, leaderboard.sale_values(instance))
+    old = None if created else _loaded(instance, customers.CUSTOMER_FIELDS)
+    customers.record_sale_change(old, customers.sale_values(instance))
+
+
+@receiver(pre_delete, sender=Sale)
+def sale_deleting(sender, instance, **kwargs):
+    if not archive.moving_sales():
+        _read_sale(instance)
+
+
+@receiver(post_delete, sender=Sale)
+def sale_deleted(sender, instance, **kwargs):
+    if archive.moving_sales():
+        return
+    old = _loaded(instance, receivables.RECEIVABLE_FIELDS) or receivables.sale_values(instance)
+    receivables.record_sale_change(old, None)
+    old = _loaded(instance, leaderboard.LEADERBOARD_FIELDS) or leaderboard.sale_values(instance)
+    leaderboard.record_sale_change(old, None)
+    old = _loaded(instance, customers.CUSTOMER_FIELDS) or customers.sale_values(instance)
+    customers.record_sale_change(old, None)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    forget_user(instance.pk)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def user_access_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    # The cached user carries its groups and permissions too
+    if not reverse:
+        if action.startswith('post_'):
+            forget_user(instance.pk)
+        return
+    if action == 'pre_clear':
+        # group.user_set.clear() does not say which users it removes
+        related = sender._meta.get_field('group' if sender is User.groups.through else 'permission')
+        instance._cleared_user_ids = list(sender.objects.filter(**{related.attname: instance.pk}).values_list('user_id', flat=True))
+    elif action == 'post_clear':
+        pk_set = getattr(instance, '_cleared_user_ids', ())
+    if action.startswith('post_'):
+        for user_id in pk_set or ():
+            forget_user(user_id)
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    old = None if created else _loaded(instance, pricing.PRICE_FIELDS)
+    if pricing.prices_changed(old, instance):
+        pricing.record_prices(instance)
+    _remember(instance)
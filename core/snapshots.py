@@ -0,0 +1,207 @@
+"""Columnar on-disk snapshots of sales for offline analytics.
+
+A snapshot is a directory with one ``.npy`` file per column, a dictionary
+file for the string columns and a manifest recording how many rows are
+committed and the last sale id exported. Exports only append sales newer
+than that id, and SalesSnapshot memory-maps the columns so analysts can
+aggregate without copying the data or touching the production database.
+
+Only the export command and analysts' scripts import this module, so the
+web workers never load NumPy.
+"""
+import heapq
+import json
+import os
+from operator import itemgetter
+from pathlib import Path
+
+import numpy as np
+from django.utils import timezone
+
+from .models import Sale, SaleArchive
+from .pricing import with_prices_at_sale
+
+MANIFEST = 'manifest.json'
+DICTIONARIES = 'dictionaries.json'
+
+# Column name -> dtype. Money is stored in integer cents (0 when unknown), missing ids as -1.
+COLUMNS = {
+    'id': np.dtype('<i8'),
+    'timestamp': np.dtype('<M8[s]'),
+    'branch_id': np.dtype('<i8'),
+    'product_id': np.dtype('<i8'),
+    'shopkeeper_id': np.dtype('<i8'),
+    'quantity_sold': np.dtype('<i4'),
+    'amount_paid': np.dtype('<i8'),
+    'amount_left': np.dtype('<i8'),
+    'cost_price': np.dtype('<i8'),
+    'selling_price': np.dtype('<i8'),
+    'mode': np.dtype('<i2'),
+}
+MONEY_COLUMNS = ('amount_paid', 'amount_left', 'cost_price', 'selling_price')
+ENCODED_COLUMNS = ('mode',)
+
+SOURCE_FIELDS = (
+    'id', 'timestamp', 'branch_id', 'product_id', 'shopkeeper_id',
+    'quantity_sold', 'amount_paid', 'amount_left', 'cost_price', 'selling_price', 'mode',
+)
+
+# Every column file gets a fixed-size header, so appending rows only has to
+# rewrite the shape in place rather than the whole file.
+HEADER_SIZE = 128
+
+
+def _header(dtype, rows):
+    fields = "{'descr': %r, 'fortran_order': False, 'shape': (%d,), }" % (dtype.str, rows)
+    # magic (6) + version (2) + header length (2), then the padded dict ending in a newline
+    padding = HEADER_SIZE - 10 - len(fields) - 1
+    return b'\x93NUMPY\x01\x00' + (HEADER_SIZE - 10).to_bytes(2, 'little') + (fields + ' ' * padding + '\n').encode('latin1')
+
+
+def _read_json(path, default):
+    if not path.exists():
+        return default
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_json(path, data):
+    # Write then rename, so a reader never sees a half-written manifest
+    tmp = path.with_suffix('.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)
+
+
+def _cents(value):
+    return 0 if value is None else int(value * 100)
+
+
+class SnapshotWriter:
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.manifest = _read_json(self.path / MANIFEST, {'rows': 0, 'last_id': 0})
+        self.dictionaries = _read_json(self.path / DICTIONARIES, {column: [] for column in ENCODED_COLUMNS})
+        self._codes = {column: {value: code for code, value in enumerate(values)} for column, values in self.dictionaries.items()}
+        self._repair()
+
+    def _column_path(self, column):
+        return self.path / f'{column}.npy'
+
+    def _repair(self):
+        # Drop anything an interrupted export wrote past the committed row count
+        rows = self.manifest['rows']
+        for column, dtype in COLUMNS.items():
+            path = self._column_path(column)
+            if not path.exists():
+                with open(path, 'wb') as f:
+                    f.write(_header(dtype, 0))
+            with open(path, 'r+b') as f:
+                f.truncate(HEADER_SIZE + rows * dtype.itemsize)
+                f.write(_header(dtype, rows))
+
+    def _encode(self, column, value):
+        codes = self._codes[column]
+        if value not in codes:
+            codes[value] = len(self.dictionaries[column])
+            self.dictionaries[column].append(value)
+        return codes[value]
+
+    def append(self, rows):
+        """Append a batch of SOURCE_FIELDS tuples, already ordered by id."""
+        if not rows:
+            return
+        data = dict(zip(SOURCE_FIELDS, zip(*rows)))
+        arrays = {
+            'id': np.array(data['id'], dtype=COLUMNS['id']),
+            'timestamp': np.array([int(ts.timestamp()) for ts in data['timestamp']], dtype='<i8').astype(COLUMNS['timestamp']),
+            'branch_id': np.array(data['branch_id'], dtype=COLUMNS['branch_id']),
+            'product_id': np.array([-1 if v is None else v for v in data['product_id']], dtype=COLUMNS['product_id']),
+            'shopkeeper_id': np.array([-1 if v is None else v for v in data['shopkeeper_id']], dtype=COLUMNS['shopkeeper_id']),
+            'quantity_sold': np.array(data['quantity_sold'], dtype=COLUMNS['quantity_sold']),
+            'mode': np.array([self._encode('mode', v) for v in data['mode']], dtype=COLUMNS['mode']),
+        }
+        for column in MONEY_COLUMNS:
+            arrays[column] = np.array([_cents(v) for v in data[column]], dtype=COLUMNS[column])
+
+        total = self.manifest['rows'] + len(rows)
+        for column, array in arrays.items():
+            with open(self._column_path(column), 'r+b') as f:
+                f.seek(0, os.SEEK_END)
+                f.write(array.tobytes())
+                f.seek(0)
+                f.write(_header(COLUMNS[column], total))
+
+        self.manifest = {
+            'rows': total,
+            'last_id': int(arrays['id'][-1]),
+            'exported_at': timezone.now().isoformat(),
+        }
+        _write_json(self.path / DICTIONARIES, self.dictionaries)
+        _write_json(self.path / MANIFEST, self.manifest)
+
+
+def _rows_since(model, last_id, batch_size):
+    sales = model.objects.filter(id__gt=last_id).order_by('id')
+    if model is Sale:
+        sales = with_prices_at_sale(sales)
+    return sales.values_list(*SOURCE_FIELDS).iterator(chunk_size=batch_size)
+
+
+def export_sales(path, batch_size=50000):
+    """Append every hot or archived sale newer than the snapshot's last id.
+
+    Edits to sales that were already exported are not picked up; rebuild the
+    snapshot from scratch (delete the directory) to refresh them.
+    Returns the number of rows appended.
+    """
+    writer = SnapshotWriter(path)
+    last_id = writer.manifest['last_id']
+    archived = _rows_since(SaleArchive, last_id, batch_size)
+    hot = _rows_since(Sale, last_id, batch_size)
+
+    exported = 0
+    batch = []
+    # Archived ids are older than hot ones, but merge by id anyway
+    for row in heapq.merge(archived, hot, key=itemgetter(0)):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            writer.append(batch)
+            exported += len(batch)
+            batch = []
+    writer.append(batch)
+    return exported + len(batch)
+
+
+class SalesSnapshot:
+    """Read-only, memory-mapped view of an exported snapshot.
+
+    ``snapshot['amount_paid']`` returns the column as a NumPy array backed
+    by the file. Money columns are integer cents.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.manifest = _read_json(self.path / MANIFEST, {'rows': 0, 'last_id': 0})
+        self.dictionaries = _read_json(self.path / DICTIONARIES, {column: [] for column in ENCODED_COLUMNS})
+        self._columns = {}
+
+    def __len__(self):
+        return self.manifest['rows']
+
+    def __getitem__(self, column):
+        if column not in self._columns:
+            array = np.load(self.path / f'{column}.npy', mmap_mode='r')
+            # A concurrent export may have grown the file past the manifest
+            self._columns[column] = array[:len(self)]
+        return self._columns[column]
+
+    def decode(self, column):
+        """The dictionary-encoded column as an array of strings."""
+        return np.asarray(self.dictionaries[column], dtype=object)[self[column]]
+
+    def group_sum(self, key, value):
+        """Sum ``value`` per distinct ``key``; returns (keys, sums)."""
+        keys, inverse = np.unique(self[key], return_inverse=True)
+        return keys, np.bincount(inverse, weights=self[value], minlength=len(keys))
@@ -0,0 +1,190 @@
+"""Stocktakes: physical counts reconciled against Product.stock.
+
+Counts are uploaded as a CSV of sku,counted or scanned one item at a time,
+and each count remembers the system stock at the moment it was taken.
+Committing applies ``counted - expected`` to the current stock, so sales
+rung up between counting a shelf and committing the stocktake are not
+lost. All adjustments are written in one transaction with an audit row
+per product.
+"""
+import csv
+import io
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, IntegerField, Q, Sum
+from django.utils import timezone
+
+from .models import Product, StockAdjustment, Stocktake, StocktakeCount
+
+LOOKUP_BATCH = 1000
+
+
+class StocktakeError(Exception):
+    pass
+
+
+def read_counts(file):
+    """Parse an uploaded sku,counted CSV. Returns ({sku: quantity}, [error, ...]).
+
+    A header row is skipped and repeated SKUs are added together, so a file
+    can list the same item once per shelf it was found on.
+    """
+    counts = {}
+    errors = []
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    for line_number, row in enumerate(csv.reader(text), start=1):
+        if not row or not row[0].strip():
+            continue
+        sku = row[0].strip()
+        try:
+            quantity = int(row[1])
+            if quantity < 0:
+                raise ValueError
+        except (IndexError, ValueError):
+            if line_number > 1:
+                errors.append(f"Line {line_number}: expected a SKU and a whole number, got {','.join(row)!r}.")
+            continue
+        counts[sku] = counts.get(sku, 0) + quantity
+    return counts, errors
+
+
+def _check_open(stocktake):
+    if stocktake.status != Stocktake.OPEN:
+        raise StocktakeError(f"Stocktake #{stocktake.id} is {stocktake.get_status_display().lower()}.")
+
+
+def record_counts(stocktake, counts):
+    """Set the counted quantity for each SKU in ``counts``, replacing earlier counts.
+
+    Returns the SKUs that don't belong to the stocktake's branch.
+    """
+    _check_open(stocktake)
+    skus = list(counts)
+    unknown = []
+    for i in range(0, len(skus), LOOKUP_BATCH):
+        chunk = skus[i:i + LOOKUP_BATCH]
+        products = {
+            sku: (product_id, stock)
+            for sku, product_id, stock in Product.objects.filter(
+                branch_id=stocktake.branch_id, sku__in=chunk,
+            ).values_list('sku', 'id', 'stock')
+        }
+        unknown.extend(sku for sku in chunk if sku not in products)
+        StocktakeCount.objects.bulk_create(
+            [
+                StocktakeCount(stocktake=stocktake, product_id=product_id, counted=counts[sku], expected=stock)
+                for sku, (product_id, stock) in products.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['stocktake', 'product'],
+            update_fields=['counted', 'expected'],
+        )
+    return unknown
+
+
+def scan(stocktake, sku, quantity=1):
+    """Add ``quantity`` scanned items to the count. Raises Product.DoesNotExist for an unknown SKU."""
+    _check_open(stocktake)
+    product = Product.objects.only('id', 'stock').get(branch_id=stocktake.branch_id, sku=sku.strip())
+    counts = StocktakeCount.objects.filter(stocktake=stocktake, product=product)
+    if counts.update(counted=F('counted') + quantity):
+        return
+    try:
+        with transaction.atomic():
+            StocktakeCount.objects.create(stocktake=stocktake, product=product, counted=quantity, expected=product.stock)
+    except IntegrityError:
+        # Another scanner counted the first one at the same time
+        counts.update(counted=F('counted') + quantity)
+
+
+def _variance():
+    return ExpressionWrapper(F('counted') - F('expected'), output_field=IntegerField())
+
+
+def variances(stocktake):
+    """Counted products whose count differs from the system stock, with ``variance`` annotated."""
+    return (
+        stocktake.counts.annotate(variance=_variance())
+        .exclude(variance=0)
+        .select_related('product')
+        .order_by('product__name', 'product_id')
+    )
+
+
+def uncounted(stocktake):
+    """Products of the branch with stock on the system that nobody counted.
+
+    Products without a SKU cannot be counted at all, so they are left out.
+    """
+    return Product.objects.filter(branch_id=stocktake.branch_id, stock__gt=0, sku__isnull=False).exclude(
+        sku='',
+    ).exclude(
+        id__in=stocktake.counts.values('product_id'),
+    )
+
+
+def summary(stocktake):
+    totals = stocktake.counts.annotate(variance=_variance()).aggregate(
+        products_counted=Count('id'),
+        with_variance=Count('id', filter=~Q(variance=0)),
+        units_over=Sum('variance', filter=Q(variance__gt=0)),
+        units_short=Sum('variance', filter=Q(variance__lt=0)),
+        value=Sum(
+            ExpressionWrapper(F('variance') * F('product__cost_price'), output_field=DecimalField(max_digits=14, decimal_places=2)),
+        ),
+    )
+    totals['uncounted'] = uncounted(stocktake).count()
+    return {field: value or 0 for field, value in totals.items()}
+
+
+def commit(stocktake, user=None, zero_uncounted=False):
+    """Apply the stocktake's variances to Product.stock and close it.
+
+    With ``zero_uncounted`` products with a SKU that were never counted are
+    written down to zero. Returns the number of products adjusted.
+    """
+    with transaction.atomic():
+        stocktake = Stocktake.objects.select_for_update().get(pk=stocktake.pk)
+        _check_open(stocktake)
+
+        changes = dict(stocktake.counts.annotate(variance=_variance()).exclude(variance=0).values_list('product_id', 'variance'))
+        if zero_uncounted:
+            changes.update((product_id, None) for product_id in uncounted(stocktake).values_list('id', flat=True))
+
+        products = []
+        adjustments = []
+        now = timezone.now()
+        locked = Product.objects.select_for_update().filter(branch_id=stocktake.branch_id).values_list('id', 'stock')
+        for product_id, stock in locked.iterator(chunk_size=5000):
+            if product_id not in changes:
+                continue
+            variance = changes[product_id]
+            new_stock = 0 if variance is None else max(0, stock + variance)
+            if new_stock == stock:
+                continue
+            products.append(Product(id=product_id, stock=new_stock))
+            adjustments.append(StockAdjustment(
+                product_id=product_id,
+                reason=StockAdjustment.STOCKTAKE,
+                previous_stock=stock,
+                new_stock=new_stock,
+                stocktake=stocktake,
+                adjusted_by=user,
+                timestamp=now,
+            ))
+
+        Product.objects.bulk_update(products, ['stock'], batch_size=LOOKUP_BATCH)
+        StockAdjustment.objects.bulk_create(adjustments, batch_size=LOOKUP_BATCH)
+
+        stocktake.status = Stocktake.COMMITTED
+        stocktake.committed_at = now
+        stocktake.save(update_fields=['status', 'committed_at'])
+    return len(products)
+
+
+def cancel(stocktake):
+    with transaction.atomic():
+        stocktake = Stocktake.objects.select_for_update().get(pk=stocktake.pk)
+        _check_open(stocktake)
+        stocktake.status = Stocktake.CANCELLED
+        stocktake.save(update_fields=['status'])
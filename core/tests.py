@@ -1,3 +1,597 @@
-from django.test import TestCase
+import gzip
+import os
+import sqlite3
+import tempfile
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.db import IntegrityError, connections
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from . import archive, backups, customers, inventory, leaderboard, receivables, replicas, repricing, snapshots, stocktake, transfers, yearend
+from .backends import CachedModelBackend, user_cache_key
+from .middleware import ReplicaPinMiddleware
+from .models import (
+    Branch, Customer, CustomerBalance, PriceHistory, Product, Sale, SaleArchive, ShopkeeperDailySales,
+    StockAdjustment, Stocktake, StockTransfer, User,
+)
+
+
+def balances():
+    return sorted(CustomerBalance.objects.values_list('customer_key', 'opened_on', 'balance'))
+
+
+def daily_sales():
+    return sorted(ShopkeeperDailySales.objects.exclude(sales_count=0, units=0, revenue=0).values_list('shopkeeper_id', 'day', 'sales_count', 'units', 'revenue'))
+
+
+def customer_totals():
+    return sorted(Customer.objects.values_list('key', 'sales_count', 'units', 'total_paid'))
+
+
+class SalesTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.branch = Branch.objects.create(name='Accra', location='Osu')
+        cls.other_branch = Branch.objects.create(name='Kumasi', location='Adum')
+        cls.shopkeeper = User.objects.create_user('ama', email='ama@example.com', password='pw')
+        cls.other_shopkeeper = User.objects.create_user('kofi', email='kofi@example.com', password='pw')
+        cls.product = Product.objects.create(
+            name='Oud', sku='OUD-1', stock=50, cost_price=Decimal('40.00'), selling_price=Decimal('60.00'), branch=cls.branch,
+        )
+
+    def sell(self, quantity=1, paid='60.00', left='0.00', shopkeeper=None, when=None, **customer):
+        return Sale.objects.create(
+            product=self.product,
+            quantity_sold=quantity,
+            amount_paid=Decimal(paid),
+            amount_left=Decimal(left),
+            mode='cash',
+            shopkeeper=shopkeeper or self.shopkeeper,
+            branch=self.branch,
+            timestamp=when or timezone.now(),
+            **customer,
+        )
+
+    def assertSummariesRebuild(self):
+        """The incrementally kept summaries match a rebuild from the sales."""
+        incremental = (balances(), daily_sales(), customer_totals())
+        receivables.rebuild_balances()
+        leaderboard.rebuild()
+        customers.rebuild_totals()
+        self.assertEqual(incremental, (balances(), daily_sales(), customer_totals()))
+
+
+class ReceivablesTests(SalesTestCase):
+    def test_payment_reduces_sale_and_balance(self):
+        sale = self.sell(paid='20.00', left='40.00', customer_name='Esi', customer_contact_details='024 444 1843')
+        receivables.record_payment(sale, '15.00', 'cash')
+
+        sale.refresh_from_db()
+        self.assertEqual((sale.amount_paid, sale.amount_left), (Decimal('35.00'), Decimal('25.00')))
+        self.assertEqual(CustomerBalance.objects.get().balance, Decimal('25.00'))
+
+        receivables.record_payment(sale, '25.00', 'momo')
+        self.assertFalse(CustomerBalance.objects.exists())
+        self.assertSummariesRebuild()
+
+    def test_payment_over_the_balance_changes_nothing(self):
+        sale = self.sell(paid='20.00', left='40.00', customer_name='Esi')
+        with self.assertRaises(ValueError):
+            receivables.record_payment(sale, '40.01', 'cash')
+
+        sale.refresh_from_db()
+        self.assertEqual(sale.amount_left, Decimal('40.00'))
+        self.assertFalse(sale.payments.exists())
+        self.assertEqual(CustomerBalance.objects.get().balance, Decimal('40.00'))
+
+    def test_sale_edits_and_deletes_move_the_balance(self):
+        sale = self.sell(paid='20.00', left='40.00', customer_name='Esi', customer_contact_details='+233 24 444 1843')
+        self.sell(paid='0.00', left='60.00', customer_name='Esi', customer_contact_details='0244441843')
+        self.assertEqual(list(CustomerBalance.objects.values_list('customer_key', 'balance')), [('0244441843', Decimal('100.00'))])
+
+        sale.amount_left = Decimal('10.00')
+        sale.save()
+        self.assertEqual(CustomerBalance.objects.get().balance, Decimal('70.00'))
+
+        sale.timestamp -= timedelta(days=3)
+        sale.save()
+        self.assertEqual(CustomerBalance.objects.count(), 2)
+        self.assertSummariesRebuild()
+
+        sale.delete()
+        self.assertEqual(CustomerBalance.objects.get().balance, Decimal('60.00'))
+        self.assertSummariesRebuild()
+
+
+class IncrementalSummaryTests(SalesTestCase):
+    def test_saves_edits_payments_and_deletes_match_rebuild(self):
+        first = self.sell(quantity=2, paid='120.00', customer_name='Esi', customer_contact_details='0244441843')
+        credit = self.sell(paid='10.00', left='50.00', customer_name='Yaw', customer_contact_details='00233 20 111 2222')
+        self.sell(quantity=3, paid='180.00', shopkeeper=self.other_shopkeeper, when=timezone.now() - timedelta(days=2))
+        self.assertSummariesRebuild()
+
+        first.quantity_sold = 1
+        first.amount_paid = Decimal('60.00')
+        first.shopkeeper = self.other_shopkeeper
+        first.customer_name = 'Yaw'
+        first.customer_contact_details = '020 111 2222'
+        first.save()
+        self.assertEqual(Customer.objects.get(key='0201112222').sales_count, 2)
+        self.assertSummariesRebuild()
+
+        receivables.record_payment(credit, '30.00', 'momo')
+        self.assertEqual(Customer.objects.get(key='0201112222').total_paid, Decimal('100.00'))
+        self.assertSummariesRebuild()
+
+        credit.delete()
+        self.assertSummariesRebuild()
+
+    def test_saving_a_refreshed_sale_counts_the_payment_once(self):
+        sale = self.sell(paid='10.00', left='50.00', customer_name='Yaw', customer_contact_details='0201112222')
+        receivables.record_payment(sale, '30.00', 'momo')
+        sale.refresh_from_db()
+        sale.mode = 'momo'
+        sale.save()
+
+        self.assertEqual(Customer.objects.get().total_paid, Decimal('40.00'))
+        self.assertSummariesRebuild()
+
+    def test_saving_a_sale_with_deferred_fields_is_an_edit(self):
+        sale = self.sell(quantity=2, paid='120.00', customer_name='Esi')
+        deferred = Sale.objects.only('id', 'mode').get(pk=sale.pk)
+        deferred.mode = 'momo'
+        deferred.save()
+
+        self.assertEqual(Customer.objects.get().sales_count, 1)
+        self.assertSummariesRebuild()
+
+
+class SellBySkuTests(SalesTestCase):
+    def test_sale_takes_stock(self):
+        sale = inventory.sell_by_sku(' OUD-1 ', self.branch, 3, 'cash', shopkeeper=self.shopkeeper)
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 47)
+        self.assertEqual((sale.quantity_sold, sale.amount_paid), (3, Decimal('180.00')))
+
+    def test_oversell_is_rejected(self):
+        with self.assertRaises(inventory.OutOfStock):
+            inventory.sell_by_sku('OUD-1', self.branch, 51, 'cash')
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 50)
+        self.assertFalse(Sale.objects.exists())
+
+    def test_failed_sale_puts_stock_back(self):
+        with mock.patch.object(Sale.objects, 'create', side_effect=IntegrityError):
+            with self.assertRaises(IntegrityError):
+                inventory.sell_by_sku('OUD-1', self.branch, 2, 'cash')
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 50)
+
+    def test_unknown_sku_and_other_branch(self):
+        with self.assertRaises(Product.DoesNotExist):
+            inventory.sell_by_sku('NOPE', self.branch, 1, 'cash')
+        with self.assertRaises(Product.DoesNotExist):
+            inventory.sell_by_sku('OUD-1', self.other_branch, 1, 'cash')
+
+
+class ArchiveTests(SalesTestCase):
+    def test_archive_moves_settled_sales_and_keeps_summaries(self):
+        last_year = timezone.now() - timedelta(days=365)
+        settled = self.sell(quantity=2, paid='120.00', when=last_year, customer_name='Esi')
+        on_credit = self.sell(paid='10.00', left='50.00', when=last_year, customer_name='Esi')
+        recent = self.sell()
+        summaries = (balances(), daily_sales(), customer_totals())
+
+        self.assertEqual(archive.archive_sales(6), 1)
+        self.assertEqual(list(SaleArchive.objects.values_list('id', 'cost_price', 'selling_price')), [(settled.id, Decimal('40.00'), Decimal('60.00'))])
+        self.assertEqual(set(Sale.objects.values_list('id', flat=True)), {on_credit.id, recent.id})
+        self.assertEqual((balances(), daily_sales(), customer_totals()), summaries)
+        self.assertSummariesRebuild()
+
+        rows = archive.sales_rows(last_year.date(), timezone.localdate() + timedelta(days=1))
+        self.assertEqual([row['id'] for row in rows], [settled.id, on_credit.id, recent.id])
+        self.assertEqual(archive.sales_totals()['sales_count'], 3)
+
+
+class SnapshotTests(SalesTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'sales')
+
+    def test_export_appends_only_new_sales(self):
+        first = self.sell(quantity=2, paid='120.00')
+        second = self.sell(paid='10.00', left='50.00')
+        self.assertEqual(snapshots.export_sales(self.path), 2)
+        self.assertEqual(snapshots.export_sales(self.path), 0)
+
+        third = self.sell(quantity=3, paid='180.00', shopkeeper=self.other_shopkeeper)
+        self.assertEqual(snapshots.export_sales(self.path), 1)
+
+        snapshot = snapshots.SalesSnapshot(self.path)
+        self.assertEqual(len(snapshot), 3)
+        self.assertEqual(list(snapshot['id']), [first.id, second.id, third.id])
+        self.assertEqual(list(snapshot['amount_paid']), [12000, 1000, 18000])
+        self.assertEqual(list(snapshot['selling_price']), [6000, 6000, 6000])
+        self.assertEqual(list(snapshot.decode('mode')), ['cash', 'cash', 'cash'])
+
+        keys, sums = snapshot.group_sum('shopkeeper_id', 'quantity_sold')
+        self.assertEqual(dict(zip(keys.tolist(), sums.tolist())), {self.shopkeeper.id: 3, self.other_shopkeeper.id: 3})
+
+    def test_interrupted_export_is_dropped_on_the_next_run(self):
+        first = self.sell()
+        snapshots.export_sales(self.path)
+        # Rows written past the manifest, as if an export died before committing
+        with open(os.path.join(self.path, 'id.npy'), 'ab') as f:
+            f.write(b'\0' * 16)
+        self.assertEqual(len(snapshots.SalesSnapshot(self.path)), 1)
+
+        second = self.sell()
+        self.assertEqual(snapshots.export_sales(self.path), 1)
+        self.assertEqual(list(snapshots.SalesSnapshot(self.path)['id']), [first.id, second.id])
+
+
+class SalesReportTests(SalesTestCase):
+    def test_pdf_lists_archived_and_hot_sales_by_time(self):
+        last_year = timezone.now() - timedelta(days=365)
+        self.sell(paid='10.00', left='50.00', when=last_year - timedelta(days=1), customer_name='Abena')
+        self.sell(when=last_year, customer_name='Esi')
+        self.sell(customer_name='Yaw')
+        self.assertEqual(archive.archive_sales(6), 1)
+
+        self.client.force_login(User.objects.create_user('boss', password='pw', is_staff=True))
+        response = self.client.get('/sales-report/pdf/', {
+            'start': (last_year - timedelta(days=2)).date().isoformat(),
+            'end': timezone.localdate().isoformat(),
+        })
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        document = b''.join(response.streaming_content)
+        self.assertTrue(document.startswith(b'%PDF'))
+        # The page content is not compressed, so the customer column reads in order
+        positions = [document.find(name) for name in (b'(Abena)', b'(Esi)', b'(Yaw)')]
+        self.assertNotIn(-1, positions)
+        self.assertEqual(positions, sorted(positions))
+
+
+@mock.patch.object(replicas, 'replica_aliases', return_value=['replica_0'])
+class ReplicaRoutingTests(SimpleTestCase):
+    def test_only_reporting_reads_go_to_a_replica(self, aliases):
+        self.assertEqual(replicas.read_db(), 'default')
+        with replicas.reporting():
+            self.assertEqual(replicas.read_db(), 'replica_0')
+            with replicas.pinned_to_primary():
+                self.assertEqual(replicas.read_db(), 'default')
+            with mock.patch.object(connections['default'], 'in_atomic_block', True):
+                self.assertEqual(replicas.read_db(), 'default')
+        self.assertEqual(replicas.ReplicaRouter().db_for_write(Sale), 'default')
+
+    def test_a_write_pins_the_browser_to_the_primary(self, aliases):
+        def view(request):
+            with replicas.reporting():
+                return HttpResponse(replicas.read_db())
+
+        middleware = ReplicaPinMiddleware(view)
+        response = middleware(RequestFactory().post('/'))
+        self.assertEqual(response.content, b'default')
+        self.assertIn(replicas.PIN_COOKIE, response.cookies)
+
+        self.assertEqual(middleware(RequestFactory().get('/')).content, b'replica_0')
+        request = RequestFactory().get('/')
+        request.COOKIES[replicas.PIN_COOKIE] = '1'
+        self.assertEqual(middleware(request).content, b'default')
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class UserCacheTests(TestCase):
+    def setUp(self):
+        self.backend = CachedModelBackend()
+        self.ama = User.objects.create_user('ama', email='ama@example.com', password='pw')
+        self.kofi = User.objects.create_user('kofi', email='kofi@example.com', password='pw')
+        self.group = Group.objects.create(name='Shopkeeper')
+
+    def cached(self, user):
+        return cache.get(user_cache_key(user.pk)) is not None
+
+    def load(self, *users):
+        for user in users:
+            self.backend.get_user(user.pk)
+
+    def test_user_is_read_once_until_saved(self):
+        self.load(self.ama)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.backend.get_user(self.ama.pk), self.ama)
+
+        self.ama.is_active = False
+        self.ama.save()
+        self.assertFalse(self.cached(self.ama))
+        # ModelBackend turns inactive users away
+        self.assertIsNone(self.backend.get_user(self.ama.pk))
+
+    def test_group_changes_from_either_side_drop_the_cached_users(self):
+        self.load(self.ama)
+        self.ama.groups.add(self.group)
+        self.assertFalse(self.cached(self.ama))
+
+        self.load(self.ama, self.kofi)
+        self.group.core_user_set.add(self.kofi)
+        self.assertEqual((self.cached(self.ama), self.cached(self.kofi)), (True, False))
+
+        self.load(self.ama, self.kofi)
+        self.group.core_user_set.clear()
+        self.assertEqual((self.cached(self.ama), self.cached(self.kofi)), (False, False))
+
+
+class StocktakeTests(SalesTestCase):
+    def test_commit_applies_variance_to_current_stock(self):
+        take = Stocktake.objects.create(branch=self.branch)
+        stocktake.record_counts(take, {'OUD-1': 45})
+        # Sold after the shelf was counted
+        Product.objects.filter(pk=self.product.pk).update(stock=48)
+
+        self.assertEqual(stocktake.commit(take), 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 43)
+        adjustment = StockAdjustment.objects.get()
+        self.assertEqual((adjustment.previous_stock, adjustment.new_stock), (48, 43))
+        with self.assertRaises(stocktake.StocktakeError):
+            stocktake.commit(take)
+
+    def test_zero_uncounted_leaves_products_without_sku(self):
+        unlabelled = Product.objects.create(
+            name='Loose musk', stock=7, cost_price=Decimal('5.00'), selling_price=Decimal('9.00'), branch=self.branch,
+        )
+        take = Stocktake.objects.create(branch=self.branch)
+
+        stocktake.commit(take, zero_uncounted=True)
+        self.product.refresh_from_db()
+        unlabelled.refresh_from_db()
+        self.assertEqual((self.product.stock, unlabelled.stock), (0, 7))
+
+
+class TransferTests(SalesTestCase):
+    def test_dispatch_and_receive_move_stock(self):
+        transfer = transfers.dispatch(self.branch, self.other_branch, {self.product.pk: 20}, user=self.shopkeeper)
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 30)
+        arrived = Product.objects.get(branch=self.other_branch, sku='OUD-1')
+        self.assertEqual(arrived.stock, 0)
+        self.assertTrue(PriceHistory.objects.filter(product=arrived).exists())
+
+        transfers.receive(transfer)
+        arrived.refresh_from_db()
+        self.assertEqual(arrived.stock, 20)
+        self.assertEqual(StockTransfer.objects.get().status, StockTransfer.RECEIVED)
+
+    def test_dispatch_more_than_in_stock_moves_nothing(self):
+        with self.assertRaises(transfers.InsufficientStock):
+            transfers.dispatch(self.branch, self.other_branch, {self.product.pk: 51})
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 50)
+        self.assertFalse(StockTransfer.objects.exists())
+        self.assertFalse(Product.objects.filter(branch=self.other_branch).exists())
+
+    def test_cancel_returns_stock_to_source(self):
+        transfer = transfers.dispatch(self.branch, self.other_branch, {self.product.pk: 20})
+        transfers.cancel(transfer)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 50)
+        with self.assertRaises(transfers.TransferError):
+            transfers.receive(transfer)
+
+
+    def test_product_added_to_the_destination_meanwhile_is_matched(self):
+        match_existing = transfers._match_existing
+        raced = []
+
+        def racing_match_existing(products, destination):
+            matched = match_existing(products, destination)
+            if not raced:
+                # Another transfer creates the same SKU at the destination right after the lookup
+                raced.append(Product.objects.create(
+                    name='Oud', sku='OUD-1', stock=5, cost_price=Decimal('40.00'), selling_price=Decimal('60.00'), branch=self.other_branch,
+                ))
+            return matched
+
+        with mock.patch.object(transfers, '_match_existing', side_effect=racing_match_existing):
+            transfer = transfers.dispatch(self.branch, self.other_branch, {self.product.pk: 20})
+        transfers.receive(transfer)
+
+        raced[0].refresh_from_db()
+        self.assertEqual(raced[0].stock, 25)
+        self.assertEqual(Product.objects.filter(branch=self.other_branch).count(), 1)
+
+    def test_repeated_conflicts_move_nothing(self):
+        with mock.patch.object(Product.objects, 'bulk_create', side_effect=IntegrityError):
+            with self.assertRaises(transfers.TransferError):
+                transfers.dispatch(self.branch, self.other_branch, {self.product.pk: 20})
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 50)
+        self.assertFalse(StockTransfer.objects.exists())
+
+
+class RepricingTests(SalesTestCase):
+    def test_ninety_nine_rounds_up_and_keeps_ninety_nine(self):
+        cheap = Product.objects.create(
+            name='Mist', sku='MIST-1', stock=5, cost_price=Decimal('2.00'), selling_price=Decimal('4.99'), branch=self.branch,
+        )
+        price = repricing.price_expression(0, rounding='ninety_nine')
+
+        self.assertEqual(repricing.apply(Product.objects.all(), price), 1)
+        self.assertEqual(
+            dict(Product.objects.values_list('name', 'selling_price')),
+            {'Oud': Decimal('60.99'), 'Mist': Decimal('4.99')},
+        )
+        self.assertEqual(repricing.apply(Product.objects.all(), price), 0)
+        cheap.refresh_from_db()
+        self.assertEqual(cheap.selling_price, Decimal('4.99'))
+
+    def test_apply_records_history(self):
+        price = repricing.price_expression(10, mode='percent')
+        changed = repricing.apply(repricing.select_products(branch=self.branch), price)
+
+        self.assertEqual(changed, 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.selling_price, Decimal('66.00'))
+        latest = PriceHistory.objects.filter(product=self.product).latest('effective_from')
+        self.assertEqual((latest.cost_price, latest.selling_price), (Decimal('40.00'), Decimal('66.00')))
+
+
+class LeaderboardTests(SalesTestCase):
+    def test_leaderboard_ranks_by_revenue(self):
+        today = timezone.localdate()
+        self.sell(paid='60.00')
+        self.sell(quantity=3, paid='180.00', shopkeeper=self.other_shopkeeper)
+
+        ranking = list(leaderboard.ranking(today, today + timedelta(days=1)))
+        self.assertEqual([row['shopkeeper__username'] for row in ranking], ['kofi', 'ama'])
+        self.assertEqual(ranking[0]['revenue'], Decimal('180.00'))
+
+
+class YearEndTests(SalesTestCase):
+    def test_report_merges_branches_months_and_archive(self):
+        year = timezone.localdate().year - 1
+        musk = Product.objects.create(
+            name='Musk', sku='MUSK-1', stock=10, cost_price=Decimal('5.00'), selling_price=Decimal('9.00'), branch=self.other_branch,
+        )
+        march = timezone.make_aware(datetime(year, 3, 15, 12))
+        june = timezone.make_aware(datetime(year, 6, 1, 12))
+        self.sell(quantity=2, paid='120.00', when=march)
+        self.sell(paid='10.00', left='50.00', when=june)
+        Sale.objects.create(
+            product=musk, quantity_sold=3, amount_paid=Decimal('27.00'), amount_left=0, mode='momo',
+            shopkeeper=self.other_shopkeeper, branch=self.other_branch, timestamp=june,
+        )
+        self.sell()
+        self.assertEqual(archive.archive_sales(3), 2)
+
+        report = yearend.year_end_report(year)
+        self.assertEqual(report['totals'], {
+            'sales_count': 3, 'quantity': 6, 'revenue': Decimal('157.00'), 'amount_left': Decimal('50.00'),
+            'cost': Decimal('135.00'), 'list_value': Decimal('207.00'), 'profit': Decimal('72.00'),
+        })
+        self.assertEqual(report['branches'][self.other_branch.id]['revenue'], Decimal('27.00'))
+        self.assertEqual(report['months'][date(year, 6, 1)]['sales_count'], 2)
+        self.assertEqual(report['modes']['momo']['quantity'], 3)
+        self.assertEqual([product_id for product_id, _totals in report['top_products']], [self.product.id, musk.id])
+        self.assertEqual(report['branch_names'], {self.branch.id: 'Accra', self.other_branch.id: 'Kumasi'})
+
+    def test_merge_does_not_depend_on_partition_order(self):
+        self.sell(quantity=2, paid='120.00', when=timezone.now().replace(month=1, day=10))
+        self.sell(paid='45.50', when=timezone.now().replace(month=2, day=10))
+        partials = [yearend.compute_partition(partition) for partition in yearend.partitions(timezone.localdate().year)]
+
+        self.assertEqual(yearend.merge(partials), yearend.merge(reversed(partials)))
+        self.assertEqual(yearend.merge(partials)['totals']['revenue'], Decimal('165.50'))
+
+
+class BackupTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        self.live = self.directory / 'live.sqlite3'
+        self.backups = self.directory / 'backups'
+        patcher = mock.patch.object(backups, '_database', return_value={'NAME': str(self.live)})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.write("CREATE TABLE note (id INTEGER PRIMARY KEY, body TEXT)")
+        self.write("INSERT INTO note (body) VALUES (?)", [(f'note {i}' * 20,) for i in range(500)])
+
+    def write(self, sql, rows=None):
+        connection = sqlite3.connect(self.live)
+        with connection:
+            if rows is None:
+                connection.execute(sql)
+            else:
+                connection.executemany(sql, rows)
+        connection.close()
+
+    def notes(self, path):
+        connection = sqlite3.connect(path)
+        try:
+            return connection.execute('SELECT id, body FROM note ORDER BY id').fetchall()
+        finally:
+            connection.close()
+
+    def test_incremental_chain_restores_the_latest_data(self):
+        full = backups.backup_sqlite(self.backups, incremental=True, sleep=0)
+        self.write("UPDATE note SET body = 'edited' WHERE id = 7")
+        self.write("INSERT INTO note (body) VALUES (?)", [('added',)] * 50)
+        incremental = backups.backup_sqlite(self.backups, incremental=True, sleep=0)
+        self.assertEqual((full['kind'], incremental['kind'], incremental['base']), (backups.FULL, backups.INCREMENTAL, full['name']))
+        self.assertLess(incremental['pages_written'], len(incremental['pages']))
+
+        expected = self.notes(self.live)
+        self.write("DELETE FROM note")
+        backups.restore_sqlite(self.backups, incremental['name'])
+        self.assertEqual(self.notes(self.live), expected)
+
+        target = self.directory / 'at_full.sqlite3'
+        backups.rebuild_sqlite(self.backups, full['name'], target)
+        self.assertEqual(len(self.notes(target)), 500)
+
+    def test_damaged_backup_is_not_restored(self):
+        manifest = backups.backup_sqlite(self.backups, sleep=0)
+        with gzip.open(self.backups / manifest['file'], 'r+b') as f:
+            data = bytearray(f.read())
+        data[-100] ^= 0xFF
+        with gzip.open(self.backups / manifest['file'], 'wb') as f:
+            f.write(bytes(data))
+        self.write("DELETE FROM note WHERE id > 10")
+
+        with self.assertRaises(backups.BackupError):
+            backups.restore_sqlite(self.backups, manifest['name'])
+        self.assertEqual(len(self.notes(self.live)), 10)
+
+
+class SalesLogFragmentTests(SalesTestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user('boss', email='boss@example.com', password='pw', is_owner=True)
+
+    def test_page_leaves_kpi_placeholders(self):
+        self.client.force_login(self.owner)
+        response = self.client.get('/sales-log/')
+        for kpi in ('total_revenue', 'today', 'month'):
+            self.assertContains(response, f'data-url="/sales-log/kpi/{kpi}/"')
+
+    def test_table_fragment_applies_the_filters(self):
+        self.sell(customer_name='Esi')
+        self.sell(customer_name='Yaw')
+        self.client.force_login(self.owner)
+        response = self.client.get('/sales-log/table/', {'date': timezone.localdate().isoformat(), 'customer_name': 'esi'})
+
+        self.assertTemplateUsed(response, 'sales_log_table.html')
+        self.assertTemplateNotUsed(response, 'base.html')
+        self.assertContains(response, 'data-count="1"')
+
+    def test_kpi_fragment_shows_only_the_viewers_tiles(self):
+        self.sell(quantity=2, paid='120.00')
+        self.client.force_login(self.owner)
+        response = self.client.get('/sales-log/kpi/month/')
+        self.assertContains(response, 'id="kpi-month"')
+        self.assertContains(response, '$120.00')
+        self.assertEqual(self.client.get('/sales-log/kpi/nope/').status_code, 404)
+
+        self.client.force_login(self.shopkeeper)
+        self.assertEqual(self.client.get('/sales-log/kpi/month/').status_code, 404)
+        self.assertContains(self.client.get('/sales-log/kpi/sales_today/'), 'Sales Today')
+
+
+class CustomerTests(SalesTestCase):
+    def test_customer_search_matches_international_prefix(self):
+        self.sell(customer_name='Esi', customer_contact_details='0244441843')
+        for query in ('+233 24', '00233 244', '024', 'esi'):
+            self.assertEqual([customer.key for customer in customers.search(query)], ['0244441843'], query)
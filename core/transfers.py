@@ -0,0 +1,172 @@
+"""Moving stock between branches.
+
+Each branch has its own Product rows, so a transfer is matched line by
+line: the destination product with the same SKU, or the same name when the
+source product has no SKU, is found in one query and created (with no
+stock) if the destination has never carried it. Dispatching takes the stock
+from the source with conditional UPDATEs, so a transfer and a till selling
+the same item can never take more than is on the shelf; receiving adds it
+to the destination. Each step is a single transaction.
+"""
+from functools import reduce
+from operator import or_
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, IntegerField, Q, When
+from django.utils import timezone
+
+from .models import Product, StockTransfer, StockTransferLine
+from .pricing import record_initial_prices
+
+BATCH = 500
+
+COPIED_FIELDS = ('name', 'sku', 'cost_price', 'selling_price', 'low_stock_threshold')
+
+
+class TransferError(Exception):
+    pass
+
+
+class InsufficientStock(TransferError):
+    def __init__(self, shortages):
+        self.shortages = shortages
+        listed = ', '.join(f'{name} ({available} left)' for name, available in list(shortages.items())[:10])
+        super().__init__(f"Not enough stock to transfer: {listed}." if shortages else "Stock changed while dispatching; try again.")
+
+
+def _batches(items):
+    items = list(items)
+    for i in range(0, len(items), BATCH):
+        yield items[i:i + BATCH]
+
+
+def _stock_change(chunk, sign):
+    return Case(*[When(pk=pk, then=F('stock') + sign * quantity) for pk, quantity in chunk], output_field=IntegerField())
+
+
+def _take(quantities):
+    for chunk in _batches(quantities.items()):
+        # Only rows that still have enough stock match, so a concurrent sale can't be oversold
+        enough = reduce(or_, (Q(pk=pk, stock__gte=quantity) for pk, quantity in chunk))
+        taken = Product.objects.filter(enough).update(stock=_stock_change(chunk, -1))
+        if taken != len(chunk):
+            raise InsufficientStock({})
+
+
+def _give(quantities):
+    for chunk in _batches(quantities.items()):
+        Product.objects.filter(pk__in=[pk for pk, _quantity in chunk]).update(stock=_stock_change(chunk, 1))
+
+
+def _match_existing(products, destination):
+    skus = {product['sku'] for product in products if product['sku']}
+    names = {product['name'] for product in products if not product['sku']}
+    by_sku, by_name = {}, {}
+    for product_id, sku, name in Product.objects.filter(branch=destination).filter(
+        Q(sku__in=skus) | Q(name__in=names),
+    ).values_list('id', 'sku', 'name'):
+        if sku:
+            by_sku[sku] = product_id
+        by_name.setdefault(name, product_id)
+
+    matched = {}
+    missing = []
+    for product in products:
+        found = by_sku.get(product['sku']) if product['sku'] else by_name.get(product['name'])
+        if found is None:
+            missing.append(product)
+        else:
+            matched[product['id']] = found
+    return matched, missing
+
+
+def match_products(products, destination):
+    """Map each source product (a dict of id and COPIED_FIELDS) to a destination product id.
+
+    Products the destination doesn't carry yet are created with no stock.
+    """
+    for _attempt in range(2):
+        matched, missing = _match_existing(products, destination)
+        try:
+            # A savepoint, so a failed insert leaves the caller's transaction usable
+            with transaction.atomic():
+                created = Product.objects.bulk_create(
+                    [Product(branch=destination, stock=0, **{field: product[field] for field in COPIED_FIELDS}) for product in missing],
+                    batch_size=BATCH,
+                )
+        except IntegrityError:
+            # Another transfer added one of these SKUs to the destination first; match again
+            continue
+        record_initial_prices(created)
+        for product, new in zip(missing, created):
+            matched[product['id']] = new.id
+        return matched
+    raise TransferError("Products were added to the destination branch at the same time; try again.")
+
+
+def dispatch(source, destination, quantities, user=None):
+    """Send ``quantities`` ({source product id: quantity}) from ``source`` to ``destination``.
+
+    Raises InsufficientStock if any product has less than requested, and
+    TransferError for other invalid requests; nothing is moved in either case.
+    """
+    if source.pk == destination.pk:
+        raise TransferError("Source and destination must be different branches.")
+    quantities = {pk: quantity for pk, quantity in quantities.items() if quantity > 0}
+    if not quantities:
+        raise TransferError("Nothing to transfer.")
+
+    with transaction.atomic():
+        products = {
+            product['id']: product
+            for product in Product.objects.select_for_update().filter(branch=source, pk__in=list(quantities)).values('id', 'stock', *COPIED_FIELDS)
+        }
+        if len(products) != len(quantities):
+            raise TransferError(f"{len(quantities) - len(products)} product(s) are not stocked at {source}.")
+        shortages = {
+            products[pk]['name']: products[pk]['stock']
+            for pk, quantity in quantities.items() if products[pk]['stock'] < quantity
+        }
+        if shortages:
+            raise InsufficientStock(shortages)
+
+        _take(quantities)
+        destinations = match_products(list(products.values()), destination)
+        transfer = StockTransfer.objects.create(source=source, destination=destination, dispatched_by=user)
+        StockTransferLine.objects.bulk_create(
+            [
+                StockTransferLine(transfer=transfer, source_product_id=pk, destination_product_id=destinations[pk], quantity=quantity)
+                for pk, quantity in quantities.items()
+            ],
+            batch_size=BATCH,
+        )
+    return transfer
+
+
+def _close(transfer, status, user=None):
+    with transaction.atomic():
+        transfer = StockTransfer.objects.select_for_update().get(pk=transfer.pk)
+        if transfer.status != StockTransfer.IN_TRANSIT:
+            raise TransferError(f"Transfer #{transfer.id} is already {transfer.get_status_display().lower()}.")
+
+        # Goods arrive at the destination, or go back on the source shelves
+        product_field = 'destination_product_id' if status == StockTransfer.RECEIVED else 'source_product_id'
+        quantities = {}
+        for product_id, quantity in transfer.lines.values_list(product_field, 'quantity'):
+            quantities[product_id] = quantities.get(product_id, 0) + quantity
+        _give(quantities)
+
+        transfer.status = status
+        if status == StockTransfer.RECEIVED:
+            transfer.received_by = user
+            transfer.received_at = timezone.now()
+        transfer.save(update_fields=['status', 'received_by', 'received_at'])
+    return transfer
+
+
+def receive(transfer, user=None):
+    return _close(transfer, StockTransfer.RECEIVED, user)
+
+
+def cancel(transfer):
+    return _close(transfer, StockTransfer.CANCELLED)
@@ -2,11 +2,16 @@ from django.urls import path
 from .views import (
     register_view, login_view, logout_view, 
     owner_dashboard, shopkeeper_dashboard,
-    manage_inventory, sales_log, add_sale, 
+    manage_inventory, sales_log, sales_log_table, sales_log_kpi, add_sale, 
     toggle_stock_permission, add_product, update_product, 
     delete_product, view_product, view_sales, edit_sale, 
     delete_sale, view_branches, add_branch, 
-    edit_branch, delete_branch, redirect_dashboard
+    edit_branch, delete_branch, redirect_dashboard,
+    receivables_report, record_payment, scan_sale,
+    download_sales_report, sale_receipt,
+    stocktake_list, stocktake_detail, commit_stocktake,
+    transfer_list, transfer_detail, reprice_products, shopkeeper_leaderboard,
+    customer_list, customer_detail
 )
 
 urlpatterns = [
@@ -26,13 +31,31 @@ urlpatterns = [
     path('edit-product/<int:product_id>/', update_product, name='edit_product'),
     path('delete-product/<int:product_id>/', delete_product, name='delete_product'),
     path('view-product/<int:product_id>/', view_product, name='view_product'),
+    path('reprice-products/', reprice_products, name='reprice_products'),
+    path('stocktakes/', stocktake_list, name='stocktake_list'),
+    path('stocktakes/<int:stocktake_id>/', stocktake_detail, name='stocktake_detail'),
+    path('stocktakes/<int:stocktake_id>/commit/', commit_stocktake, name='commit_stocktake'),
+    path('transfers/', transfer_list, name='transfer_list'),
+    path('transfers/<int:transfer_id>/', transfer_detail, name='transfer_detail'),
     
     # Sales Management
     path('sales-log/', sales_log, name='manage_sales'),
+    path('sales-log/table/', sales_log_table, name='sales_log_table'),
+    path('sales-log/kpi/<str:kpi>/', sales_log_kpi, name='sales_log_kpi'),
     path('add-sale/', add_sale, name='add_sale'),
+    path('scan-sale/', scan_sale, name='scan_sale'),
     path('view-sales/<int:sale_id>/', view_sales, name='view_sales'),
     path('edit-sale/<int:sale_id>/', edit_sale, name='edit_sale'),
     path('delete-sale/<int:sale_id>/', delete_sale, name='delete_sale'),
+    path('sales-report/pdf/', download_sales_report, name='download_sales_report'),
+    path('view-sales/<int:sale_id>/receipt/', sale_receipt, name='sale_receipt'),
+    
+    # Receivables
+    path('receivables/', receivables_report, name='receivables'),
+    path('leaderboard/', shopkeeper_leaderboard, name='leaderboard'),
+    path('customers/', customer_list, name='customer_list'),
+    path('customers/<int:customer_id>/', customer_detail, name='customer_detail'),
+    path('record-payment/<int:sale_id>/', record_payment, name='record_payment'),
     
     # Branch Management
     path('view-branches/', view_branches, name='view_branches'),
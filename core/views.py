@@ -1,20 +1,21 @@
 from django.shortcuts import get_object_or_404, render, redirect
 from django.contrib.auth import authenticate, login, logout
-from .forms import LoginForm, UserRegistrationForm, SaleForm, ProductForm, BranchForm
+from .forms import (
+    LoginForm, UserRegistrationForm, SaleForm, ProductForm, BranchForm, PaymentForm, ScanSaleForm,
+    StocktakeForm, StockCountUploadForm, StockCountScanForm, StockTransferForm, RepricingForm,
+)
 from django.contrib.auth.decorators import login_required
-from .models import User, Product, Sale, ShopkeeperPermission, Branch
+from .models import User, Product, Sale, ShopkeeperPermission, Branch, Stocktake, StockTransfer, Customer
 from datetime import timedelta, datetime
 from django.utils import timezone
 from django.contrib.admin.views.decorators import staff_member_required
-from django.db.models import Sum, F, FloatField, Count, Avg, ExpressionWrapper, DecimalField
-import pdfkit
-from django.http import HttpResponse
+from django.db.models import F, FloatField, Count, Avg
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.template.loader import render_to_string
 from django.contrib.auth.models import Group
 from django.contrib import messages
-from django.db.models.functions import TruncMonth
-from django.utils.timezone import now
-from datetime import date, timedelta
+from django.core.paginator import Paginator
+from . import receivables, customers, inventory, leaderboard, archive, pdf, replicas, transfers, repricing, stocktake as stocktakes
 
 def register_view(request):
     if request.method == 'POST':
@@ -112,44 +113,32 @@ def shopkeeper_dashboard(request):
 
 
 @staff_member_required
+@replicas.reporting_view
 def owner_dashboard(request):
-    # Calculate total revenue
-    total_revenue = Sale.objects.aggregate(total=Sum('amount_paid'))['total'] or 0
-    today = date.today()
+    today = timezone.localdate()
     first_day_of_month = today.replace(day=1)
-    
-    
+    first_day_of_week = today - timedelta(days=today.weekday())
+
+    # Totals span hot and archived sales; the period figures only touch recent rows
+    all_time = archive.sales_totals()
+    this_month = archive.sales_totals(start=first_day_of_month)
+    this_week = archive.sales_totals(start=first_day_of_week)
+    this_day = archive.sales_totals(start=today, end=today + timedelta(days=1))
+
+    total_revenue = all_time['revenue']
     # Calculate profit dynamically
-    profit = Sale.objects.annotate(
-        profit=ExpressionWrapper(
-            (F('product__selling_price') - F('product__cost_price')) * F('quantity_sold'),
-            output_field=DecimalField()
-        )
-    ).aggregate(total_profit=Sum('profit'))['total_profit'] or 0
-    daily_sales = Sale.objects.filter(timestamp__date=today).annotate(
-        profit=ExpressionWrapper(
-            (F('product__selling_price') - F('product__cost_price')) * F('quantity_sold'),
-            output_field=DecimalField()
-        )
-    )
-    daily_profit = daily_sales.aggregate(total_profit=Sum('profit'))['total_profit'] or 0
-    
-    monthly_sales = Sale.objects.filter(timestamp__date__gte=first_day_of_month).annotate(
-        profit=ExpressionWrapper(
-            (F('product__selling_price') - F('product__cost_price')) * F('quantity_sold'),
-            output_field=DecimalField()
-        )
-    )
-    monthly_profit = monthly_sales.aggregate(total_profit=Sum('profit'))['total_profit'] or 0
+    profit = all_time['list_value'] - all_time['cost']
+    daily_profit = this_day['list_value'] - this_day['cost']
+    monthly_profit = this_month['list_value'] - this_month['cost']
 
     # Other calculations
-    monthly_revenue = Sale.objects.filter(timestamp__month=now().month).aggregate(total=Sum('amount_paid'))['total'] or 0
-    weekly_revenue = Sale.objects.filter(timestamp__week=now().isocalendar()[1]).aggregate(total=Sum('amount_paid'))['total'] or 0
-    total_sales_count = Sale.objects.count()
+    monthly_revenue = this_month['revenue']
+    weekly_revenue = this_week['revenue']
+    total_sales_count = all_time['sales_count']
     total_products_count = Product.objects.count()
     active_shopkeepers_count = User.objects.filter(groups__name='Shopkeeper', is_active=True).count()
     total_shopkeepers_count = User.objects.filter(groups__name='Shopkeeper').count()
-    average_sale_value = Sale.objects.aggregate(avg=Sum('amount_paid') / Sum('quantity_sold'))['avg'] or 0
+    average_sale_value = all_time['revenue'] / all_time['quantity'] if all_time['quantity'] else 0
     recent_sales = Sale.objects.order_by('-timestamp')[:10]
     shopkeepers = User.objects.filter(groups__name='Shopkeeper')
 
@@ -195,12 +184,38 @@ def add_sale(request):
 
 
 @login_required
-def sales_log(request):
-    filter_date_str = request.GET.get('date', None)
-    customer_name_filter = request.GET.get('customer_name', None)
-    shopkeeper_filter = request.GET.get('shopkeeper', None)
-    branch_filter = request.GET.get('branch', None)
+def scan_sale(request):
+    if request.method != 'POST':
+        return render(request, 'scan_sale.html', {'form': ScanSaleForm()})
+
+    form = ScanSaleForm(request.POST)
+    if not form.is_valid():
+        return JsonResponse({'ok': False, 'errors': form.errors}, status=400)
+
+    try:
+        sale = inventory.sell_by_sku(
+            form.cleaned_data['sku'],
+            form.cleaned_data['branch'],
+            form.cleaned_data['quantity'],
+            form.cleaned_data['mode'],
+            shopkeeper=request.user,
+        )
+    except Product.DoesNotExist:
+        return JsonResponse({'ok': False, 'error': 'No product with this barcode in the selected branch.'}, status=404)
+    except inventory.OutOfStock as e:
+        return JsonResponse({'ok': False, 'error': str(e)}, status=409)
+
+    return JsonResponse({
+        'ok': True,
+        'sale_id': sale.id,
+        'product': sale.product.name,
+        'quantity': sale.quantity_sold,
+        'amount_paid': str(sale.amount_paid),
+    })
 
+
+def _sales_log_filters(request):
+    filter_date_str = request.GET.get('date', None)
     if filter_date_str:
         try:
             filter_date = datetime.strptime(filter_date_str, '%Y-%m-%d').date()
@@ -209,44 +224,64 @@ def sales_log(request):
     else:
         filter_date = datetime.today().date()
 
+    return {
+        'filter_date': filter_date,
+        'customer_name_filter': request.GET.get('customer_name', None),
+        'shopkeeper_filter': request.GET.get('shopkeeper', None),
+        'branch_filter': request.GET.get('branch', None),
+    }
+
+
+def _filtered_sales(filters):
+    filter_date = filters['filter_date']
     sales = Sale.objects.all().select_related('product', 'shopkeeper', 'branch').order_by('-timestamp')
-    sales = sales.filter(timestamp__date=filter_date)
-
-    if customer_name_filter:
-        sales = sales.filter(customer_name__icontains=customer_name_filter)
-
-    if shopkeeper_filter:
-        sales = sales.filter(shopkeeper__username__icontains=shopkeeper_filter)
-
-    if branch_filter:
-        sales = sales.filter(branch__name__icontains=branch_filter)
-        
-    today = now().date()
-    current_month = now().month
-    current_year = now().year
-
-    # Calculate daily revenue and profit
-    daily_sales = Sale.objects.filter(timestamp__date=today).annotate(
-        profit=ExpressionWrapper(
-            F('amount_paid') - (F('product__cost_price') * F('quantity_sold')),
-            output_field=DecimalField()
-        )
-    )
-    daily_revenue = daily_sales.aggregate(Sum('amount_paid'))['amount_paid__sum'] or 0
-    daily_profit = daily_sales.aggregate(Sum('profit'))['profit__sum'] or 0
-
-    # Calculate monthly revenue and profit
-    monthly_sales = Sale.objects.filter(timestamp__month=current_month, timestamp__year=current_year).annotate(
-        profit=ExpressionWrapper(
-            F('amount_paid') - (F('product__cost_price') * F('quantity_sold')),
-            output_field=DecimalField()
-        )
+    sales = sales.filter(
+        timestamp__gte=archive.day_start(filter_date),
+        timestamp__lt=archive.day_start(filter_date + timedelta(days=1)),
     )
-    monthly_revenue = monthly_sales.aggregate(Sum('amount_paid'))['amount_paid__sum'] or 0
-    monthly_profit = monthly_sales.aggregate(Sum('profit'))['profit__sum'] or 0
 
-    # Calculate total revenue
-    total_revenue = Sale.objects.aggregate(Sum('amount_paid'))['amount_paid__sum'] or 0
+    if filters['customer_name_filter']:
+        sales = sales.filter(customer_name__icontains=filters['customer_name_filter'])
+
+    if filters['shopkeeper_filter']:
+        sales = sales.filter(shopkeeper__username__icontains=filters['shopkeeper_filter'])
+
+    if filters['branch_filter']:
+        sales = sales.filter(branch__name__icontains=filters['branch_filter'])
+    return sales
+
+
+def _sales_log_kpis(user):
+    # KPI tiles on the sales log; the month tile is only shown to owners
+    return ('total_revenue', 'today', 'month') if user.is_owner else ('total_revenue', 'today', 'sales_today')
+
+
+def _sales_log_kpi_values(kpis):
+    # Only the aggregates the requested tiles show
+    today = timezone.localdate()
+    values = {}
+    if 'total_revenue' in kpis:
+        # Includes archived sales
+        values['total_revenue'] = archive.sales_totals()['revenue']
+
+    if 'today' in kpis or 'sales_today' in kpis:
+        daily_totals = archive.sales_totals(start=today, end=today + timedelta(days=1))
+        values['daily_revenue'] = daily_totals['revenue']
+        values['daily_profit'] = daily_totals['revenue'] - daily_totals['cost']
+        values['today_sales_count'] = daily_totals['sales_count']
+
+    if 'month' in kpis:
+        monthly_totals = archive.sales_totals(start=today.replace(day=1))
+        values['monthly_revenue'] = monthly_totals['revenue']
+        values['monthly_profit'] = monthly_totals['revenue'] - monthly_totals['cost']
+    return values
+
+
+@login_required
+@replicas.reporting_view
+def sales_log(request):
+    filters = _sales_log_filters(request)
+    kpis = _sales_log_kpis(request.user)
 
     shopkeepers = User.objects.filter(groups__name='Shopkeeper').order_by('username')
     branches = Branch.objects.all().order_by('name')
@@ -255,22 +290,31 @@ def sales_log(request):
     is_owner = request.user.groups.filter(name="Owner").exists() or request.user.is_superuser
 
     return render(request, 'sales_log.html', {
-        'sales': sales,
-        'filter_date': filter_date,
-        'customer_name_filter': customer_name_filter,
-        'shopkeeper_filter': shopkeeper_filter,
-        'branch_filter': branch_filter,
+        'sales': _filtered_sales(filters),
+        **filters,
         'shopkeepers': shopkeepers,
         'branches': branches,
-        'daily_revenue': daily_revenue,
-        'daily_profit': daily_profit,
-        'monthly_revenue': monthly_revenue,
-        'monthly_profit': monthly_profit,
-        'total_revenue': total_revenue,
+        'kpis': kpis,
         'is_owner': is_owner,
     })
 
 
+@login_required
+@replicas.reporting_view
+def sales_log_table(request):
+    # Just the sales table, swapped into the page when a filter changes
+    filters = _sales_log_filters(request)
+    return render(request, 'sales_log_table.html', {'sales': _filtered_sales(filters), **filters})
+
+
+@login_required
+@replicas.reporting_view
+def sales_log_kpi(request, kpi):
+    if kpi not in _sales_log_kpis(request.user):
+        raise Http404('Unknown KPI.')
+    return render(request, 'sales_log_kpi.html', {'kpi': kpi, **_sales_log_kpi_values([kpi])})
+
+
 @staff_member_required
 def view_sales(request, sale_id):
     sale = get_object_or_404(Sale.objects.select_related('product', 'shopkeeper', 'branch'), pk=sale_id)
@@ -310,6 +354,84 @@ def delete_sale(request, sale_id):
     return redirect('manage_sales')
 
 
+@staff_member_required
+@replicas.reporting_view
+def receivables_report(request):
+    customers, totals = receivables.aging_report()
+    return render(request, 'receivables.html', {
+        'customers': customers,
+        'totals': totals,
+        'buckets': receivables.AGING_BUCKETS,
+    })
+
+
+@staff_member_required
+@replicas.reporting_view
+def customer_list(request):
+    query = request.GET.get('q', '').strip()
+    found = customers.search(query) if query else Customer.objects.order_by('-total_paid')
+    page = Paginator(found, 100).get_page(request.GET.get('page'))
+    return render(request, 'customer_list.html', {'page': page, 'query': query})
+
+
+@staff_member_required
+@replicas.reporting_view
+def customer_detail(request, customer_id):
+    customer = get_object_or_404(Customer, pk=customer_id)
+    page = Paginator(customers.history(customer), 100).get_page(request.GET.get('page'))
+    return render(request, 'customer_detail.html', {
+        'customer': customer,
+        'page': page,
+    })
+
+
+@staff_member_required
+@replicas.reporting_view
+def shopkeeper_leaderboard(request):
+    # ?start=YYYY-MM-DD&end=YYYY-MM-DD (end inclusive), otherwise this month so far
+    today = timezone.localdate()
+    try:
+        start = datetime.strptime(request.GET['start'], '%Y-%m-%d').date()
+        end = datetime.strptime(request.GET['end'], '%Y-%m-%d').date()
+    except (KeyError, ValueError):
+        start, end = today.replace(day=1), today
+    order_by = request.GET.get('order')
+    if order_by not in dict(leaderboard.RANKINGS):
+        order_by = 'revenue'
+
+    return render(request, 'leaderboard.html', {
+        'rows': leaderboard.ranking(start, end + timedelta(days=1), order_by),
+        'start': start,
+        'end': end,
+        'order_by': order_by,
+        'rankings': leaderboard.RANKINGS,
+    })
+
+
+@staff_member_required
+def record_payment(request, sale_id):
+    sale = get_object_or_404(Sale.objects.select_related('product'), pk=sale_id)
+
+    if request.method == 'POST':
+        form = PaymentForm(request.POST)
+        if form.is_valid():
+            try:
+                receivables.record_payment(
+                    sale,
+                    form.cleaned_data['amount'],
+                    form.cleaned_data['mode'],
+                    received_by=request.user,
+                )
+            except ValueError as e:
+                return render(request, 'record_payment.html', {'form': form, 'sale': sale, 'error': str(e)})
+            messages.success(request, 'Payment recorded.')
+            return redirect('receivables')
+    else:
+        form = PaymentForm(initial={'amount': sale.amount_left, 'mode': sale.mode})
+
+    return render(request, 'record_payment.html', {'form': form, 'sale': sale})
+
+
 @login_required
 def manage_inventory(request):
     items = Product.objects.all().select_related('branch').order_by('name')
@@ -344,6 +466,149 @@ def update_product(request, product_id):
     return render(request, 'update_product.html', {'form': form, 'product': product})
 
 
+@staff_member_required
+def reprice_products(request):
+    summary = None
+    if request.method == 'POST':
+        form = RepricingForm(request.POST)
+        if form.is_valid():
+            if request.POST.get('action') == 'apply':
+                changed = repricing.apply(form.products(), form.price())
+                messages.success(request, f"Repriced {changed} product(s).")
+                return redirect('manage_inventory')
+            summary = repricing.preview(form.products(), form.price())
+    else:
+        form = RepricingForm()
+
+    return render(request, 'reprice_products.html', {'form': form, 'summary': summary})
+
+
+@staff_member_required
+def stocktake_list(request):
+    if request.method == 'POST':
+        form = StocktakeForm(request.POST)
+        if form.is_valid():
+            stocktake = form.save(commit=False)
+            stocktake.started_by = request.user
+            stocktake.save()
+            return redirect('stocktake_detail', stocktake_id=stocktake.id)
+    else:
+        form = StocktakeForm()
+
+    recent = Stocktake.objects.select_related('branch', 'started_by').order_by('-started_at')[:20]
+    return render(request, 'stocktake_list.html', {'form': form, 'stocktakes': recent})
+
+
+@staff_member_required
+def stocktake_detail(request, stocktake_id):
+    stocktake = get_object_or_404(Stocktake.objects.select_related('branch'), pk=stocktake_id)
+    upload_form = StockCountUploadForm()
+    scan_form = StockCountScanForm()
+
+    if request.method == 'POST':
+        try:
+            if 'file' in request.FILES:
+                upload_form = StockCountUploadForm(request.POST, request.FILES)
+                if upload_form.is_valid():
+                    counts, errors = stocktakes.read_counts(upload_form.cleaned_data['file'])
+                    unknown = stocktakes.record_counts(stocktake, counts)
+                    for error in errors[:10]:
+                        messages.warning(request, error)
+                    if unknown:
+                        messages.warning(request, f"{len(unknown)} SKU(s) not found in {stocktake.branch}: {', '.join(unknown[:10])}")
+                    messages.success(request, f"Recorded counts for {len(counts) - len(unknown)} product(s).")
+                    return redirect('stocktake_detail', stocktake_id=stocktake.id)
+            else:
+                scan_form = StockCountScanForm(request.POST)
+                if scan_form.is_valid():
+                    try:
+                        stocktakes.scan(stocktake, scan_form.cleaned_data['sku'], scan_form.cleaned_data['quantity'])
+                    except Product.DoesNotExist:
+                        messages.error(request, f"Unknown SKU {scan_form.cleaned_data['sku']} for {stocktake.branch}.")
+                    return redirect('stocktake_detail', stocktake_id=stocktake.id)
+        except stocktakes.StocktakeError as e:
+            messages.error(request, str(e))
+            return redirect('stocktake_detail', stocktake_id=stocktake.id)
+
+    page = Paginator(stocktakes.variances(stocktake), 100).get_page(request.GET.get('page'))
+    return render(request, 'stocktake_detail.html', {
+        'stocktake': stocktake,
+        'summary': stocktakes.summary(stocktake),
+        'page': page,
+        'upload_form': upload_form,
+        'scan_form': scan_form,
+    })
+
+
+@staff_member_required
+def commit_stocktake(request, stocktake_id):
+    stocktake = get_object_or_404(Stocktake, pk=stocktake_id)
+    if request.method == 'POST':
+        try:
+            if request.POST.get('action') == 'cancel':
+                stocktakes.cancel(stocktake)
+                messages.info(request, 'Stocktake cancelled.')
+            else:
+                adjusted = stocktakes.commit(stocktake, request.user, zero_uncounted=bool(request.POST.get('zero_uncounted')))
+                messages.success(request, f"Stocktake committed: {adjusted} product(s) adjusted.")
+        except stocktakes.StocktakeError as e:
+            messages.error(request, str(e))
+    return redirect('stocktake_detail', stocktake_id=stocktake.id)
+
+
+@staff_member_required
+def transfer_list(request):
+    if request.method == 'POST':
+        form = StockTransferForm(request.POST, request.FILES)
+        if form.is_valid():
+            source = form.cleaned_data['source']
+            quantities, errors = stocktakes.read_counts(form.cleaned_data['file'])
+            products = dict(Product.objects.filter(branch=source, sku__in=list(quantities)).values_list('sku', 'id'))
+            unknown = [sku for sku in quantities if sku not in products]
+            if unknown:
+                errors.append(f"{len(unknown)} SKU(s) not found in {source}: {', '.join(unknown[:10])}")
+            if not errors:
+                try:
+                    transfer = transfers.dispatch(
+                        source,
+                        form.cleaned_data['destination'],
+                        {products[sku]: quantity for sku, quantity in quantities.items()},
+                        user=request.user,
+                    )
+                except transfers.TransferError as e:
+                    errors.append(str(e))
+                else:
+                    messages.success(request, f"Transfer #{transfer.id} dispatched.")
+                    return redirect('transfer_detail', transfer_id=transfer.id)
+            for error in errors[:10]:
+                messages.error(request, error)
+    else:
+        form = StockTransferForm()
+
+    recent = StockTransfer.objects.select_related('source', 'destination', 'dispatched_by').order_by('-dispatched_at')[:20]
+    return render(request, 'transfer_list.html', {'form': form, 'transfers': recent})
+
+
+@staff_member_required
+def transfer_detail(request, transfer_id):
+    transfer = get_object_or_404(StockTransfer.objects.select_related('source', 'destination'), pk=transfer_id)
+    if request.method == 'POST':
+        try:
+            if request.POST.get('action') == 'cancel':
+                transfers.cancel(transfer)
+                messages.info(request, 'Transfer cancelled; stock returned to the source branch.')
+            else:
+                transfers.receive(transfer, request.user)
+                messages.success(request, 'Transfer received.')
+        except transfers.TransferError as e:
+            messages.error(request, str(e))
+        return redirect('transfer_detail', transfer_id=transfer.id)
+
+    lines = transfer.lines.select_related('source_product', 'destination_product').order_by('source_product__name')
+    page = Paginator(lines, 100).get_page(request.GET.get('page'))
+    return render(request, 'transfer_detail.html', {'transfer': transfer, 'page': page})
+
+
 @staff_member_required
 def delete_product(request, product_id):
     product = get_object_or_404(Product, pk=product_id)
@@ -504,18 +769,68 @@ def settings_view(request):
     return render(request, 'settings.html')
 
 
+# Columns of pdf.sales_report, in order
+REPORT_ROW_FIELDS = (
+    'id', 'timestamp', 'product__name', 'quantity_sold', 'amount_paid', 'amount_left',
+    'mode', 'customer_name', 'shopkeeper__username', 'branch__name',
+)
+
+
 @staff_member_required
+@replicas.reporting_view
 def download_sales_report(request):
-    sales = Sale.objects.select_related('product', 'shopkeeper').order_by('-timestamp')[:100]
-    html = render_to_string('sales_pdf.html', {'sales': sales})
-
+    # ?start=YYYY-MM-DD&end=YYYY-MM-DD reports every sale in that range (end inclusive),
+    # otherwise the 100 most recent sales
     try:
-        pdf = pdfkit.from_string(html, False)
-        response = HttpResponse(pdf, content_type='application/pdf')
+        start = datetime.strptime(request.GET['start'], '%Y-%m-%d').date()
+        end = datetime.strptime(request.GET['end'], '%Y-%m-%d').date()
+    except (KeyError, ValueError):
+        start = end = None
+
+    sales = Sale.objects.order_by('-timestamp')
+    if start and end:
+        sales = sales.filter(
+            timestamp__gte=archive.day_start(start),
+            timestamp__lt=archive.day_start(end + timedelta(days=1)),
+        ).order_by('timestamp')
+    else:
+        sales = sales[:100]
+
+    if request.GET.get('engine') == 'wkhtmltopdf':
+        # The old HTML template path, kept for comparison
+        # Imported here so workers only load pdfkit if someone asks for it
+        import pdfkit
+
+        html = render_to_string('sales_pdf.html', {'sales': sales.select_related('product', 'shopkeeper')})
+        try:
+            document = pdfkit.from_string(html, False)
+        except OSError as e:
+            return HttpResponse(f"Error generating PDF: {e}. Make sure wkhtmltopdf is installed and in your system's PATH.", status=500)
+        response = HttpResponse(document, content_type='application/pdf')
         response['Content-Disposition'] = 'attachment; filename="sales_report.pdf"'
         return response
-    except OSError as e:
-        return HttpResponse(f"Error generating PDF: {e}. Make sure wkhtmltopdf is installed and in your system's PATH.", status=500)
 
+    if start and end:
+        # Older sales have been moved to the archive; read both. The rows are
+        # read after the view returns, so pick the replica now.
+        names = ('product__name', 'shopkeeper__username', 'branch__name')
+        rows = (
+            tuple(row[field] for field in REPORT_ROW_FIELDS)
+            for row in archive.sales_rows(start, end + timedelta(days=1), fields=names, prices=False, using=replicas.read_db())
+        )
+    else:
+        rows = sales.values_list(*REPORT_ROW_FIELDS).using(replicas.read_db()).iterator(chunk_size=2000)
+    response = StreamingHttpResponse(
+        pdf.sales_report(rows, subtitle=pdf.report_subtitle(start, end)),
+        content_type='application/pdf',
+    )
+    response['Content-Disposition'] = 'attachment; filename="sales_report.pdf"'
+    return response
 
 
+@staff_member_required
+def sale_receipt(request, sale_id):
+    sale = get_object_or_404(Sale.objects.select_related('product', 'shopkeeper', 'branch'), pk=sale_id)
+    response = HttpResponse(pdf.sale_receipt(sale), content_type='application/pdf')
+    response['Content-Disposition'] = f'inline; filename="receipt_{sale.id}.pdf"'
+    return response
@@ -0,0 +1,44 @@
+"""Do the work of a worker's first request before it accepts traffic.
+
+gunicorn.conf.py calls warm_up() in the master after the app is preloaded,
+so every forked worker inherits the imported views, resolved URLconf,
+compiled templates and static manifest. Database connections are not
+opened here: Django's are per thread and, without a persistent
+CONN_MAX_AGE, closed at the end of the first request anyway.
+"""
+import logging
+from pathlib import Path
+
+from django.apps import apps
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.db import connections
+from django.template import TemplateDoesNotExist, TemplateSyntaxError
+from django.template.loader import get_template
+from django.urls import get_resolver
+
+logger = logging.getLogger(__name__)
+
+
+def _template_names():
+    # Only our own pages; third-party apps ship templates for integrations we don't install
+    directory = Path(apps.get_app_config('core').path) / 'templates'
+    for path in sorted(directory.rglob('*.html')):
+        yield path.relative_to(directory).as_posix()
+
+
+def warm_up():
+    # Imports core.views and compiles every URL pattern
+    get_resolver().url_patterns
+    # The cached template loader keeps these compiled for the life of the process
+    for name in _template_names():
+        try:
+            get_template(name)
+        except (TemplateDoesNotExist, TemplateSyntaxError) as e:
+            logger.warning("Could not precompile template %s: %s", name, e)
+    # Reads the collectstatic manifest
+    staticfiles_storage.url('css/base.css')
+
+
+def close_databases():
+    # Connections opened before a fork must never be shared with the children
+    connections.close_all()
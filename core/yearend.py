@@ -0,0 +1,117 @@
+"""Year-end report across every branch, computed in parallel.
+
+The year is split into one partition per branch and month. Each partition
+is aggregated on its own (hot and archived sales, at the prices in force
+when they were sold) and the partial totals are merged afterwards. With
+more than one worker the partitions run in a process pool; each worker
+opens its own database connection. Money is summed as Decimal and the
+merge breaks ties by id, so the report is the same for any worker count.
+"""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+from django.db.models import Count, F, Sum
+
+from . import replicas
+from .archive import add_months, day_start, line_total
+from .models import Branch, Product, Sale, SaleArchive
+from .pricing import price_at
+from .warmup import close_databases
+
+TOTAL_FIELDS = ('sales_count', 'quantity', 'revenue', 'amount_left', 'cost', 'list_value')
+TOP_PRODUCTS = 20
+
+
+def partitions(year):
+    """(branch id, first day of month) for every branch and month of ``year``."""
+    months = [date(year, month, 1) for month in range(1, 13)]
+    return [(branch_id, month) for branch_id in Branch.objects.order_by('id').values_list('id', flat=True) for month in months]
+
+
+def _zero():
+    return dict.fromkeys(TOTAL_FIELDS, 0)
+
+
+def _add(totals, row):
+    for field in TOTAL_FIELDS:
+        totals[field] += row[field] or 0
+
+
+def compute_partition(partition):
+    """Partial totals for one (branch id, month): overall, per product and per payment mode."""
+    branch_id, month = partition
+    filters = {
+        'branch_id': branch_id,
+        'timestamp__gte': day_start(month),
+        'timestamp__lt': day_start(add_months(month, 1)),
+    }
+    sources = [
+        (Sale.objects.filter(**filters), price_at('cost_price'), price_at('selling_price')),
+        (SaleArchive.objects.filter(**filters), F('cost_price'), F('selling_price')),
+    ]
+    totals, products, modes = _zero(), {}, {}
+    with replicas.reporting():
+        for sales, cost_price, selling_price in sources:
+            aggregates = {
+                'sales_count': Count('id'),
+                'quantity': Sum('quantity_sold'),
+                'revenue': Sum('amount_paid'),
+                'amount_left': Sum('amount_left'),
+                'cost': Sum(line_total(cost_price)),
+                'list_value': Sum(line_total(selling_price)),
+            }
+            _add(totals, sales.aggregate(**aggregates))
+            for row in sales.values('product_id').annotate(**aggregates).order_by():
+                _add(products.setdefault(row['product_id'], _zero()), row)
+            for row in sales.values('mode').annotate(**aggregates).order_by():
+                _add(modes.setdefault(row['mode'], _zero()), row)
+    return {'partition': partition, 'totals': totals, 'products': products, 'modes': modes}
+
+
+def merge(partials):
+    """Combine partition results into the full report, in partition order."""
+    report = {'totals': _zero(), 'branches': {}, 'months': {}, 'products': {}, 'modes': {}}
+    for partial in sorted(partials, key=lambda partial: partial['partition']):
+        branch_id, month = partial['partition']
+        _add(report['totals'], partial['totals'])
+        _add(report['branches'].setdefault(branch_id, _zero()), partial['totals'])
+        _add(report['months'].setdefault(month, _zero()), partial['totals'])
+        for key in ('products', 'modes'):
+            for item, totals in partial[key].items():
+                _add(report[key].setdefault(item, _zero()), totals)
+
+    for totals in [report['totals'], *report['branches'].values(), *report['months'].values(), *report['products'].values(), *report['modes'].values()]:
+        totals['profit'] = totals['list_value'] - totals['cost']
+    # Deleted products (None) sort last among equal revenues
+    report['top_products'] = sorted(
+        report['products'].items(), key=lambda item: (-item[1]['revenue'], item[0] is None, item[0] or 0),
+    )[:TOP_PRODUCTS]
+    return report
+
+
+def _pool_context():
+    # Workers inherit the configured Django process; connections are closed before forking
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return None
+
+
+def year_end_report(year, workers=1):
+    """The report for calendar ``year``, computed by ``workers`` processes (1 runs in-process)."""
+    work = partitions(year)
+    context = _pool_context()
+    if workers > 1 and context is not None:
+        close_databases()
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            partials = list(pool.map(compute_partition, work))
+    else:
+        partials = [compute_partition(partition) for partition in work]
+
+    report = merge(partials)
+    report['year'] = year
+    report['branch_names'] = dict(Branch.objects.filter(id__in=report['branches']).values_list('id', 'name'))
+    report['product_names'] = dict(
+        Product.objects.filter(id__in=[product_id for product_id, _totals in report['top_products'] if product_id]).values_list('id', 'name')
+    )
+    return report
@@ -10,7 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
-from decouple import config
+from decouple import Csv, config
 import dj_database_url
 import os
 from pathlib import Path
@@ -40,6 +40,8 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'core.middleware.HTMLGZipMiddleware',
+    'core.middleware.ReplicaPinMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -54,8 +56,15 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Compile each template once per process, including in development;
+            # the autoreloader clears the cache when a template changes
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -80,6 +89,61 @@ DATABASES = {
 db_from_env = dj_database_url.config(conn_max_age=500)
 DATABASES['default'].update(db_from_env)
 
+# SQLite only. By default a transaction takes the write lock at its first
+# write; if another connection wrote in the meantime, SQLite cannot wait for
+# the lock and fails at once with "database is locked". That is what
+# select_for_update() stock updates (sales, stock transfers, stocktakes) run
+# into whenever two tills write together. IMMEDIATE takes the write lock when
+# the transaction starts instead, so writers queue for up to SQLITE_TIMEOUT
+# seconds. The cost is that read-only atomic blocks queue behind writers
+# too. Set SQLITE_IMMEDIATE_TRANSACTIONS=False for a single-user database.
+if config('SQLITE_IMMEDIATE_TRANSACTIONS', default=True, cast=bool) and DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    DATABASES['default'].setdefault('OPTIONS', {}).update({
+        'transaction_mode': 'IMMEDIATE',
+        'timeout': config('SQLITE_TIMEOUT', default=20, cast=int),
+    })
+
+# Optional read replicas for the reporting views, as comma-separated database
+# URLs (a copy of db.sqlite3 is enough locally). See core/replicas.py.
+for index, replica_url in enumerate(config('DATABASE_REPLICA_URLS', default='', cast=Csv())):
+    DATABASES[f'replica_{index}'] = {
+        **dj_database_url.parse(replica_url, conn_max_age=500),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['core.replicas.ReplicaRouter']
+
+# Seconds a browser keeps reading from the primary after it writes
+REPLICA_PIN_SECONDS = config('REPLICA_PIN_SECONDS', default=10, cast=int)
+
+# Cache for sessions and the logged-in user when those are cached (see below).
+# 'file' is shared by every worker on the host; 'locmem' is per process, so a
+# logout or deactivation handled by one worker would not reach the others
+# until their copies expire.
+CACHE_BACKEND = config('CACHE_BACKEND', default='file')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': config('CACHE_DIR', default=os.path.join(BASE_DIR, '.cache')),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    } if CACHE_BACKEND == 'file' else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+
+# Session storage: 'db', 'cached_db' (read from the cache, written through to
+# the database) or 'signed_cookies' (no server-side storage at all).
+# 'cached_db' and CACHE_USERS rely on every worker seeing the same cache, so
+# only turn them on when they all run on one host; separate hosts (several
+# Heroku dynos, say) would each keep serving their own copy after a logout.
+SESSION_STRATEGY = config('SESSION_STRATEGY', default='db')
+SESSION_ENGINE = f'django.contrib.sessions.backends.{SESSION_STRATEGY}'
+
+# Serve request.user from the cache; see core/backends.py
+CACHE_USERS = config('CACHE_USERS', default=False, cast=bool)
+AUTHENTICATION_BACKENDS = ['core.backends.CachedModelBackend' if CACHE_USERS else 'django.contrib.auth.backends.ModelBackend']
+USER_CACHE_SECONDS = config('USER_CACHE_SECONDS', default=300, cast=int)
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -105,13 +169,36 @@ USE_TZ = True
 # Static files (CSS, JavaScript, Images)
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+
+# Hashed file names let WhiteNoise send far-future immutable cache headers, and
+# collectstatic writes gzip and brotli copies it serves to capable browsers.
+# Pages fail to render until collectstatic has produced the manifest.
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage',
+    },
+}
 
 # Extra places for collectstatic to find static files
 STATICFILES_DIRS = [
     os.path.join(BASE_DIR, 'static'),
 ]
 
+# Columnar sales snapshot written by the export_sales_snapshot command
+SALES_SNAPSHOT_DIR = config('SALES_SNAPSHOT_DIR', default=os.path.join(BASE_DIR, 'snapshots', 'sales'))
+
+# Country calling code stripped from customer phone numbers, so +233 24... and 024... match
+PHONE_COUNTRY_CODE = config('PHONE_COUNTRY_CODE', default='233')
+
+# Database backups written by the backup_database command
+BACKUP_DIR = config('BACKUP_DIR', default=os.path.join(BASE_DIR, 'backups'))
+
+# Results and baselines written by the run_benchmarks command
+BENCHMARK_DIR = config('BENCHMARK_DIR', default=os.path.join(BASE_DIR, 'benchmarks'))
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
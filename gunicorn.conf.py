@@ -0,0 +1,29 @@
+"""Gunicorn settings, picked up automatically from the working directory.
+
+The app is loaded once in the master and forked, so workers start with
+Django, the views and the templates already in memory.
+"""
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+
+# Heroku sets WEB_CONCURRENCY from the dyno size; otherwise the usual 2 x cores + 1
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+# More than one thread switches gunicorn to the gthread worker
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+worker_class = 'gthread' if threads > 1 else 'sync'
+
+preload_app = True
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+max_requests = 2000
+max_requests_jitter = 200
+accesslog = '-'
+
+
+def when_ready(server):
+    # In the master, after the preloaded app is imported and before any worker forks
+    from core.warmup import close_databases, warm_up
+
+    warm_up()
+    close_databases()
@@ -0,0 +1,132 @@
+$(document).ready(function() {
+    // Initialize product select with select2
+    $('#id_product').select2({
+        placeholder: "Select a product",
+        width: '100%',
+        theme: 'bootstrap4'
+    });
+
+    // Initialize hidden fields
+    $('#id_mode').hide();
+
+    // Handle payment method selection
+    $('.payment-method-option').click(function() {
+        $('.payment-method-option').removeClass('selected');
+        $(this).addClass('selected');
+        $('#id_mode').val($(this).data('value'));
+        $('#summaryPaymentMethod').text($(this).find('.card-text').text());
+    });
+
+    // Product selection changed
+    $('#id_product').change(function() {
+        const productId = $(this).val();
+        if (productId) {
+            // In a real application, you would make an AJAX call to get product data
+            // For this template, we'll simulate product data
+            fetchProductDetails(productId);
+        } else {
+            $('.product-info').fadeOut();
+            resetCalculations();
+        }
+    });
+
+    // Quantity changed
+    $('#id_quantity_sold').on('input', function() {
+        calculateTotals();
+    });
+
+    // Amount paid changed
+    $('#id_amount_paid').on('input', function() {
+        calculateBalance();
+    });
+
+    // Simulate fetching product details (in a real app, this would be an AJAX call)
+    function fetchProductDetails(productId) {
+        // This is a mock function that simulates getting product details
+        // In a real app, you would make an AJAX call to your server
+
+        // Simulate loading delay
+        setTimeout(function() {
+            // Show product info box
+            $('.product-info').fadeIn();
+
+            // For this template, we'll use dummy data
+            // In a real app, this would come from your server
+            const productName = $('#id_product option:selected').text();
+            const price = Math.random() * 100 + 10; // Random price between 10 and 110
+            const stock = Math.floor(Math.random() * 50) + 1; // Random stock between 1 and 50
+            const branch = "Main Branch"; // Example branch name
+
+            // Update product info display
+            $('#productPrice').text('$' + price.toFixed(2));
+            $('#productStock').text(stock);
+            $('#productBranch').text(branch);
+
+            // Update summary
+            $('#summaryProduct').text(productName);
+            $('#summaryPrice').text('$' + price.toFixed(2));
+
+            // Calculate totals
+            calculateTotals();
+        }, 300);
+    }
+
+    function calculateTotals() {
+        const price = parseFloat($('#productPrice').text().replace('$', '')) || 0;
+        const quantity = parseInt($('#id_quantity_sold').val()) || 0;
+        const total = price * quantity;
+
+        // Update displays
+        $('#totalPrice').text('$' + total.toFixed(2));
+        $('#summaryQuantity').text(quantity);
+        $('#summarySubtotal').text('$' + total.toFixed(2));
+        $('#summaryTotal').text('$' + total.toFixed(2));
+
+        // Handle amount paid and balance
+        calculateBalance();
+    }
+
+    function calculateBalance() {
+        const total = parseFloat($('#summaryTotal').text().replace('$', '')) || 0;
+        const amountPaid = parseFloat($('#id_amount_paid').val()) || 0;
+        const balance = total - amountPaid;
+
+        // Update balance field
+        $('#id_amount_left').val(balance.toFixed(2));
+    }
+
+    function resetCalculations() {
+        $('#productPrice').text('$0.00');
+        $('#productStock').text('0');
+        $('#productBranch').text('N/A');
+        $('#totalPrice').text('$0.00');
+        $('#summaryProduct').text('-');
+        $('#summaryPrice').text('$0.00');
+        $('#summaryQuantity').text('0');
+        $('#summarySubtotal').text('$0.00');
+        $('#summaryTotal').text('$0.00');
+        $('#summaryPaymentMethod').text('-');
+    }
+
+    // Apply Bootstrap form styling
+    $('.form-control').addClass('rounded-lg');
+
+    // Form validation before submit
+    $('#saleForm').submit(function(event) {
+        const product = $('#id_product').val();
+        const quantity = $('#id_quantity_sold').val();
+        const mode = $('#id_mode').val();
+        const amountPaid = $('#id_amount_paid').val();
+
+        if (!product || !quantity || !mode || !amountPaid) {
+            event.preventDefault();
+            alert('Please fill in all required fields!');
+        }
+
+        const stock = parseInt($('#productStock').text());
+        if (parseInt(quantity) > stock) {
+            event.preventDefault();
+            alert('Error: Quantity exceeds available stock!');
+        }
+    });
+});
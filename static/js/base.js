@@ -0,0 +1,23 @@
+$(document).ready(function() {
+    // Sidebar toggle functionality for mobile
+    $('#sidebarCollapse').on('click', function() {
+        $('.sidebar').toggleClass('active');
+        $('.overlay').toggleClass('active');
+        $('body').toggleClass('sidebar-collapsed');
+    });
+
+    // Close sidebar when clicking on overlay (mobile)
+    $('.overlay').on('click', function() {
+        $('.sidebar').removeClass('active');
+        $('.overlay').removeClass('active');
+    });
+
+    // Auto-hide alerts after 5 seconds
+    $('.alert').delay(5000).fadeOut(500);
+
+    // Enable tooltips
+    $('[data-toggle="tooltip"]').tooltip();
+
+    // Enable popovers
+    $('[data-toggle="popover"]').popover();
+});
@@ -0,0 +1,67 @@
+// Chart series are rendered into data-* attributes on the canvases
+function chartData(canvas, name) {
+    var raw = canvas.getAttribute('data-' + name) || '';
+    return raw.split(',').filter(function(value) {
+        return value.trim() !== '';
+    }).map(Number);
+}
+
+// Sales Chart
+var salesCanvas = document.getElementById('salesChart');
+var ctx = salesCanvas.getContext('2d');
+var salesChart = new Chart(ctx, {
+    type: 'line',
+    data: {
+        labels: ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'],
+        datasets: [{
+            label: 'Revenue',
+            data: chartData(salesCanvas, 'revenue'),
+            backgroundColor: 'rgba(52, 152, 219, 0.1)',
+            borderColor: 'rgba(52, 152, 219, 1)',
+            borderWidth: 2,
+            tension: 0.4
+        }, {
+            label: 'Profit',
+            data: chartData(salesCanvas, 'profit'),
+            backgroundColor: 'rgba(46, 204, 113, 0.1)',
+            borderColor: 'rgba(46, 204, 113, 1)',
+            borderWidth: 2,
+            tension: 0.4
+        }]
+    },
+    options: {
+        responsive: true,
+        maintainAspectRatio: false,
+        scales: {
+            yAxes: [{
+                ticks: {
+                    beginAtZero: true,
+                    callback: function(value) {
+                        return '$' + value.toLocaleString();
+                    }
+                }
+            }]
+        }
+    }
+});
+
+// Revenue Sources Chart
+var sourcesCanvas = document.getElementById('revenueSourcesChart');
+var ctx2 = sourcesCanvas.getContext('2d');
+var revenueSourcesChart = new Chart(ctx2, {
+    type: 'doughnut',
+    data: {
+        labels: ['Electronics', 'Clothing', 'Food & Beverage', 'Others'],
+        datasets: [{
+            data: chartData(sourcesCanvas, 'sources'),
+            backgroundColor: ['#3498db', '#2ecc71', '#f39c12', '#95a5a6'],
+            hoverBackgroundColor: ['#2980b9', '#27ae60', '#e67e22', '#7f8c8d'],
+            borderWidth: 0
+        }]
+    },
+    options: {
+        responsive: true,
+        maintainAspectRatio: false,
+        cutoutPercentage: 75
+    }
+});